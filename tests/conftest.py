@@ -0,0 +1,49 @@
+"""
+Shared pytest fixtures for the standalone Paramiko based tests.
+"""
+
+import pytest
+
+from test_add_vlan import (
+    DEFAULT_TESTBED_PATH,
+    SshClient,
+    extract_dut_connection,
+    load_testbed_yaml,
+)
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "no_dut: test never connects to the DUT")
+
+
+@pytest.fixture(scope="session")
+def testbed():
+    """Parsed testbed YAML, loaded once per session."""
+    return load_testbed_yaml(DEFAULT_TESTBED_PATH)
+
+
+@pytest.fixture(scope="session")
+def dut_conn(testbed):
+    """(ip, username, password) of DUT D1."""
+    return extract_dut_connection(testbed)
+
+
+@pytest.fixture(scope="session")
+def ssh_client_factory(dut_conn):
+    """
+    Callable returning the shared, connected SshClient for DUT D1.
+    Nothing connects until a test calls it, so tests that never touch
+    the DUT never pay for the SSH handshake.
+    """
+    clients = []
+
+    def factory():
+        if not clients:
+            cli = SshClient(*dut_conn)
+            cli.connect()
+            clients.append(cli)
+        return clients[0]
+
+    yield factory
+    for cli in clients:
+        cli.close()
@@ -6,11 +6,27 @@ Creates VLAN 10, makes Ethernet4 untagged member, logs output.
 """
 
 from __future__ import annotations
+import atexit
+import json
 import os
+import re
+import select
+import socket
+import tempfile
+import threading
+import time
 import yaml
 import paramiko
+import pytest
 from datetime import datetime
-from typing import Dict, Any, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    # libyaml C bindings are several times faster than the pure-Python loader
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
 # ------------------------- CONSTANTS -----------------------------
 
@@ -19,13 +35,76 @@ DEFAULT_LOGS_DIR = "/home/adminuser/Shiva/sonic-mgmt/spytest/tests/logs"
 VLAN_ID = 10
 TARGET_INTERFACE = "Ethernet4"
 
+# Parsed testbed is stored as JSON next to the YAML with this suffix
+TESTBED_CACHE_SUFFIX = ".cache.json"
+
+# Pooled SSH transports unused for longer than this (seconds) are closed
+POOL_IDLE_TIMEOUT = 300
+
+# AEAD ciphers are tried first when both ends support them: one
+# cryptography call per packet instead of cipher plus a Python-side HMAC
+PREFERRED_CIPHERS = ("aes128-gcm@openssh.com", "aes256-gcm@openssh.com")
+
+# Bytes read per recv() when draining an exec channel
+RECV_CHUNK = 65536
+
+# Marker used by SshClient.run_batch to split one combined output per command
+BATCH_MARK = "===SSH-BATCH"
+
 # ------------------------- UTILITY FUNCTIONS --------------------
 
+def _write_testbed_cache(cache: str, data: Dict[str, Any]):
+    # Skip the sidecar when JSON would not give back the same data
+    # (non-string keys, dates and other YAML-only types)
+    try:
+        text = json.dumps(data)
+    except (TypeError, ValueError):
+        return
+    if json.loads(text) != data:
+        return
+
+    # Write to a temp file and rename so parallel workers never see a partial file
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(cache) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp, cache)
+    except OSError:
+        # Read-only testbed directory: keep working without the sidecar
+        if tmp:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+
+
+@lru_cache(maxsize=8)
+def _load_testbed_cached(path: str, mtime_ns: int) -> Dict[str, Any]:
+    cache = path + TESTBED_CACHE_SUFFIX
+    try:
+        if os.stat(cache).st_mtime_ns >= mtime_ns:
+            with open(cache, "r") as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    with open(path, "r") as f:
+        data = yaml.load(f, Loader=SafeLoader) or {}
+    _write_testbed_cache(cache, data)
+    return data
+
+
 def load_testbed_yaml(path: str) -> Dict[str, Any]:
+    """
+    Parse the testbed YAML. The result is cached per (path, mtime), so the
+    file is parsed at most once per process unless it changes on disk, and
+    across processes via a JSON sidecar that is newer than the YAML.
+    Callers must treat the returned dict as read-only.
+    """
     if not os.path.isfile(path):
         raise FileNotFoundError(f"YAML not found: {path}")
-    with open(path, "r") as f:
-        return yaml.safe_load(f) or {}
+    return _load_testbed_cached(path, os.stat(path).st_mtime_ns)
 
 
 def extract_dut_connection(testbed: Dict[str, Any]) -> Tuple[str, str, str]:
@@ -45,19 +124,102 @@ def extract_dut_connection(testbed: Dict[str, Any]) -> Tuple[str, str, str]:
     return ip, user, pwd
 
 
+@lru_cache(maxsize=None)
 def ensure_logs_dir(path: str):
+    # Memoized: the makedirs syscall runs once per path per process
     os.makedirs(path, exist_ok=True)
 
 
-def write_log_file(content: str) -> str:
+def new_log_path() -> str:
     ensure_logs_dir(DEFAULT_LOGS_DIR)
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    path = os.path.join(DEFAULT_LOGS_DIR, f"test_vlan_ethernet4_{ts}.log")
+    return os.path.join(DEFAULT_LOGS_DIR, f"test_vlan_ethernet4_{ts}.log")
+
+
+def write_log_file(content: str) -> str:
+    path = new_log_path()
     with open(path, "w") as f:
         f.write(content)
     return path
 
 
+# ------------------------- CONNECTION POOL -----------------------
+
+class TransportPool:
+    """
+    One authenticated paramiko.Transport per (host, port, user), shared by
+    every SshClient so commands to the same DUT only open new channels.
+    Clients check a transport out per command, so idle, dead or
+    unauthenticated transports are closed and transparently reconnected.
+    """
+
+    def __init__(self, idle_timeout=POOL_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        # key -> (transport, last checkout time)
+        self._transports: Dict[Tuple[str, int, str], Tuple[paramiko.Transport, float]] = {}
+
+    @staticmethod
+    def _connect(host, port, user, pwd) -> paramiko.Transport:
+        sock = socket.create_connection((host, port), timeout=30)
+        # CLI commands are small request/response exchanges; don't let Nagle delay them
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        transport = paramiko.Transport(sock)
+        opts = transport.get_security_options()
+        opts.ciphers = (
+            tuple(c for c in PREFERRED_CIPHERS if c in opts.ciphers)
+            + tuple(c for c in opts.ciphers if c not in PREFERRED_CIPHERS)
+        )
+        try:
+            transport.connect(username=user, password=pwd)
+        except Exception:
+            transport.close()
+            raise
+        transport.set_keepalive(30)
+        return transport
+
+    def _evict(self, now: float):
+        for key, (transport, last_used) in list(self._transports.items()):
+            usable = transport.is_active() and transport.is_authenticated()
+            if now - last_used > self.idle_timeout or not usable:
+                transport.close()
+                del self._transports[key]
+
+    def get(self, host, port, user, pwd) -> paramiko.Transport:
+        key = (host, port, user)
+
+        with self._lock:
+            self._evict(time.monotonic())
+            entry = self._transports.get(key)
+            if entry:
+                self._transports[key] = (entry[0], time.monotonic())
+                return entry[0]
+
+        # Connect outside the lock so a slow DUT doesn't stall other hosts
+        transport = self._connect(host, port, user, pwd)
+
+        with self._lock:
+            entry = self._transports.get(key)
+            if entry:
+                # Another thread connected to the same DUT first; keep theirs
+                transport.close()
+                transport = entry[0]
+            self._transports[key] = (transport, time.monotonic())
+
+        return transport
+
+    def close_all(self):
+        with self._lock:
+            for transport, _ in self._transports.values():
+                transport.close()
+            self._transports.clear()
+
+
+_TRANSPORTS = TransportPool()
+atexit.register(_TRANSPORTS.close_all)
+
+
 # ------------------------- SSH WRAPPER ---------------------------
 
 class SshClient:
@@ -66,106 +228,214 @@ class SshClient:
         self.user = username
         self.pwd = password
         self.port = port
-        self.client: Optional[paramiko.SSHClient] = None
+        self.connected = False
 
     def connect(self):
-        self.client = paramiko.SSHClient()
-        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self.client.connect(
-            hostname=self.host,
-            username=self.user,
-            password=self.pwd,
-            port=self.port,
-            look_for_keys=False,
-            allow_agent=False,
-            timeout=30,
-        )
+        # Authenticate up front; commands check the transport out again
+        self._transport()
+        self.connected = True
 
     def close(self):
-        if self.client:
-            self.client.close()
+        # The transport stays in the pool; it is closed on idle timeout or exit
+        self.connected = False
+
+    def _transport(self) -> paramiko.Transport:
+        """Pooled transport for this DUT, reconnected if it was evicted."""
+        return _TRANSPORTS.get(self.host, self.port, self.user, self.pwd)
+
+    def _sudo(self, cmd):
+        safe = self.pwd.replace("'", "'\"'\"'")
+        return f"echo '{safe}' | sudo -S -p '' {cmd}"
+
+    def _exec(self, cmd, stdin_data: Optional[str] = None) -> Tuple[int, str, str]:
+        if not self.connected:
+            raise RuntimeError(f"SshClient for {self.host} is not connected")
+        chan = self._transport().open_session()
+        try:
+            chan.exec_command(cmd)
+            if stdin_data is not None:
+                chan.sendall(stdin_data.encode())
+                chan.shutdown_write()
+            out, err = drain_channel(chan)
+            return (
+                chan.recv_exit_status(),
+                out.decode(errors="ignore"),
+                err.decode(errors="ignore"),
+            )
+        finally:
+            chan.close()
 
     def run(self, cmd, sudo=False):
         if sudo:
-            safe = self.pwd.replace("'", "'\"'\"'")
-            cmd = f"echo '{safe}' | sudo -S -p '' {cmd}"
-
-        stdin, stdout, stderr = self.client.exec_command(cmd)
-        return (
-            stdout.channel.recv_exit_status(),
-            stdout.read().decode(errors="ignore"),
-            stderr.read().decode(errors="ignore"),
+            cmd = self._sudo(cmd)
+        return self._exec(cmd)
+
+    def run_batch(self, cmds: List[str], sudo=True) -> List[Tuple[int, str, str]]:
+        """
+        Run several commands over a single exec channel.
+        The script is streamed to 'bash -s' and every command is framed by
+        markers on stdout/stderr so per-command (status, out, err) can be
+        rebuilt from the combined output.
+        """
+        lines = []
+        for i, cmd in enumerate(cmds):
+            if sudo:
+                cmd = self._sudo(cmd)
+            begin = f"{BATCH_MARK} BEGIN {i}==="
+            # The bare newline on stderr ends the previous command's stderr,
+            # so its last line cannot run into the BEGIN marker
+            lines.append(f"echo '{begin}'; echo >&2; echo '{begin}' >&2")
+            # Commands must not read the script itself from stdin
+            lines.append(f"{{ {cmd}; }} < /dev/null")
+            lines.append(f"rc=$?; echo; echo \"{BATCH_MARK} END {i} $rc===\"")
+
+        _, out, err = self._exec("bash -s", "\n".join(lines) + "\n")
+        return split_batch_output(out, err, len(cmds))
+
+
+def drain_channel(chan: paramiko.Channel) -> Tuple[bytes, bytes]:
+    """
+    Read stdout and stderr of an exec channel in one select() loop until
+    the remote side sends EOF, instead of blocking on each stream in turn.
+    """
+    out, err = bytearray(), bytearray()
+    while True:
+        select.select([chan], [], [], 0.5)
+        while chan.recv_ready():
+            out += chan.recv(RECV_CHUNK)
+        while chan.recv_stderr_ready():
+            err += chan.recv_stderr(RECV_CHUNK)
+        # sshd may send exit-status before the last output, so stop on EOF
+        # (or close) rather than exit_status_ready()
+        done = chan.eof_received or chan.closed
+        if done and not chan.recv_ready() and not chan.recv_stderr_ready():
+            return bytes(out), bytes(err)
+
+
+def split_batch_output(out: str, err: str, count: int) -> List[Tuple[int, str, str]]:
+    """Split combined run_batch stdout/stderr back into per-command results."""
+    mark = re.escape(BATCH_MARK)
+
+    outs = {
+        int(m.group(1)): (int(m.group(3)), m.group(2))
+        for m in re.finditer(
+            rf"^{mark} BEGIN (\d+)===\n(.*?)\n{mark} END \1 (\d+)===$", out, re.S | re.M
         )
+    }
+    parts = re.split(rf"^{mark} BEGIN (\d+)===\n", err, flags=re.M)
+    # Every chunk but the last ends with the newline echoed before the next BEGIN
+    chunks = [text[:-1] for text in parts[2::2][:-1]] + parts[2::2][-1:]
+    errs = {int(i): text for i, text in zip(parts[1::2], chunks)}
+
+    # Commands never reached (e.g. batch aborted) report status -1
+    return [outs.get(i, (-1, "")) + (errs.get(i, ""),) for i in range(count)]
 
 
 # ------------------------- MAIN VLAN ACTION ----------------------
 
-def run_vlan_test():
+def run_vlan_test(cli: Optional[SshClient] = None):
     """
     Real test that connects to SONiC DUT and configures VLAN 10.
+    A connected client may be passed in; otherwise one is taken from the pool.
     """
 
-    tb = load_testbed_yaml(DEFAULT_TESTBED_PATH)
-    ip, user, pwd = extract_dut_connection(tb)
-
-    cli = SshClient(ip, user, pwd)
-    cli.connect()
-
-    logs = []
-    
-    # 1. Create VLAN
-    status, out, err = cli.run(f"config vlan add {VLAN_ID}", sudo=True)
-    logs.append(f"[CREATE VLAN]\n{out}\n{err}\n")
-
-    # 2. Flush IP from interface
-    status, out, err = cli.run(f"ip addr flush dev {TARGET_INTERFACE}", sudo=True)
-    logs.append(f"[FLUSH IP]\n{out}\n{err}\n")
-    
-   
-    # 3. Add interface as untagged member
-    status, out, err = cli.run(f"config vlan member add {VLAN_ID} {TARGET_INTERFACE}",sudo=True)
-    logs.append(f"[ADD MEMBER]\n{out}\n{err}\n")
-
-    # 4. show vlan brief
-    status, out, err = cli.run("show vlan brief")
-    logs.append(f"[SHOW VLAN]\n{out}\n{err}\n")
-    
-    # 5. remove vlan member
-    status, out, err = cli.run(f"config vlan member del {VLAN_ID} {TARGET_INTERFACE}",sudo=True)
-    logs.append(f"[DELETE MEMBER]\n{out}\n{err}\n")
-   
-    # 6. remove vlan
-    status, out, err = cli.run(f"config vlan del {VLAN_ID}",sudo=True)
-    logs.append(f"[DELETE VLAN]\n{out}\n{err}\n")
-    cli.close()
-
-    # Write log file
-    logfile = write_log_file("\n".join(logs))
+    if cli is None:
+        tb = load_testbed_yaml(DEFAULT_TESTBED_PATH)
+        ip, user, pwd = extract_dut_connection(tb)
+
+        cli = SshClient(ip, user, pwd)
+        cli.connect()
+
+    steps = [
+        # 1. Create VLAN
+        ("CREATE VLAN", f"config vlan add {VLAN_ID}"),
+        # 2. Flush IP from interface
+        ("FLUSH IP", f"ip addr flush dev {TARGET_INTERFACE}"),
+        # 3. Add interface as untagged member
+        ("ADD MEMBER", f"config vlan member add {VLAN_ID} {TARGET_INTERFACE}"),
+        # 4. show vlan brief
+        ("SHOW VLAN", "show vlan brief"),
+        # 5. remove vlan member
+        ("DELETE MEMBER", f"config vlan member del {VLAN_ID} {TARGET_INTERFACE}"),
+        # 6. remove vlan
+        ("DELETE VLAN", f"config vlan del {VLAN_ID}"),
+    ]
+
+    # All steps share one SSH channel instead of one exec_command each
+    results = cli.run_batch([cmd for _, cmd in steps])
+
+    # Stream each step's output straight to the log file
+    logfile = new_log_path()
+    with open(logfile, "w", buffering=1 << 16) as f:
+        for (label, _), (status, out, err) in zip(steps, results):
+            f.write(f"[{label}]\n{out}\n{err}\n\n")
     return logfile
 
 
 # ------------------------- PYTEST/SPYTEST TESTS ------------------
 
-def test_yaml_load():
-    tb = load_testbed_yaml(DEFAULT_TESTBED_PATH)
-    assert isinstance(tb, dict)
+requires_testbed = pytest.mark.skipif(
+    not os.path.exists(DEFAULT_TESTBED_PATH),
+    reason=f"testbed YAML not found: {DEFAULT_TESTBED_PATH}",
+)
 
 
-def test_extract_connection():
-    tb = load_testbed_yaml(DEFAULT_TESTBED_PATH)
-    ip, u, p = extract_dut_connection(tb)
+@pytest.mark.no_dut
+@requires_testbed
+def test_yaml_load(testbed):
+    assert isinstance(testbed, dict)
+
+
+@pytest.mark.no_dut
+@requires_testbed
+def test_extract_connection(dut_conn):
+    ip, u, p = dut_conn
     assert ip and u and p
 
 
+@pytest.mark.no_dut
 def test_log_creation():
     path = write_log_file("sample log")
     assert os.path.isfile(path)
+
+
+@pytest.mark.no_dut
+def test_split_batch_output():
+    # Framed the way run_batch's script prints it: BEGIN on both streams
+    # (a bare newline first on stderr), then the command output, an extra
+    # newline and END with its status on stdout
+    def frame(i, out, rc):
+        return f"{BATCH_MARK} BEGIN {i}===\n{out}\n{BATCH_MARK} END {i} {rc}===\n"
+
+    def err_frame(i, err):
+        return f"\n{BATCH_MARK} BEGIN {i}===\n{err}"
+
+    out = (
+        frame(0, "line1\nline2\n", 0)
+        + frame(1, "no newline", 1)
+        + frame(2, "", 0)
+        + f"{BATCH_MARK} BEGIN 3===\npartial\n"
+    )
+    err = (
+        err_frame(0, "")
+        + err_frame(1, "no newline on stderr")
+        + err_frame(2, "warning\n")
+        + err_frame(3, "aborted")
+    )
+
+    assert split_batch_output(out, err, 4) == [
+        (0, "line1\nline2\n", ""),
+        (1, "no newline", "no newline on stderr"),
+        (0, "", "warning\n"),
+        (-1, "", "aborted"),
+    ]
  
 
-def test_add_vlan_on_dut():
+@requires_testbed
+def test_add_vlan_on_dut(ssh_client_factory):
     """
     MAIN test — executes VLAN commands on SONiC switch.
     SpyTest/PyTest both run this correctly.
     """
-    logfile = run_vlan_test()
+    logfile = run_vlan_test(ssh_client_factory())
     assert os.path.isfile(logfile)
@@ -16,6 +16,7 @@ Logs stored under: ./logs/full_vlan_test/
 """
 
 from spytest import st
+import atexit
 import os
 import re
 import time
@@ -31,8 +32,36 @@ PORT_VLAN20 = "Ethernet8"
 
 PKT_SIZES = [64, 128, 256, 512, 1024, 1500]
 
+# Seconds between echo requests; 0.2 is the smallest iputils allows non-root
+PING_INTERVAL = 0.2
+
 TEST_NAME = "full_vlan_test"
 LOG_DIR = f"./logs/{TEST_NAME}"
+_LOG_DIR_PREFIX = LOG_DIR.rstrip("/") + "/"
+
+# Set SPYTEST_FORCE_CLEANUP=1 to clean up VLANs even when they look absent
+FORCE_CLEANUP = os.environ.get("SPYTEST_FORCE_CLEANUP", "0") == "1"
+
+# Seconds a cached_show() result may be reused
+SHOW_CACHE_TTL = 2.0
+
+# Separates per-size output blocks in ping_sizes
+PING_SIZE_MARK = "=== PING SIZE"
+
+# Output parsers, compiled once at import
+_PKT_LOSS_RE = re.compile(r"(\d+)% packet loss")
+_CPU_RE = re.compile(r"CPU:\s*([\d.]+)%")
+_RX_BYTES_RE = re.compile(r"(\d+) bytes input")
+_TX_BYTES_RE = re.compile(r"(\d+) bytes output")
+_VLAN_ID_RE = re.compile(r"\bVlan(\d+)\b")
+_ETH_RE = re.compile(r"Ethernet\d+")
+
+# VLAN id -> member ports (None = unknown) as last seen on the DUT.
+# None until snapshot_vlan_state() runs, which disables skipping.
+_vlan_state_cache = None
+
+# [epoch second, formatted timestamp] reused by _now_ts()
+_TS_CACHE = [0, ""]
 
 # -------------------------------------------------
 # LOGGING UTILITIES
@@ -43,31 +72,69 @@ def setup_log_dir():
     Logs are automatically written under --logs-path.
     This function creates directory for test artifacts.
     """
-    if not os.path.exists(LOG_DIR):
-        os.makedirs(LOG_DIR)
+    os.makedirs(LOG_DIR, exist_ok=True)
     
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     log_file = os.path.join(LOG_DIR, f"{TEST_NAME}_{timestamp}.log")
     
     st.log(f"Using log directory: {LOG_DIR}")
     st.log(f"Test log file: {log_file}")
+    _log_handle(log_file)
     
     return log_file
 
 
+# log file path -> append handle kept open for the whole run
+_log_handles = {}
+
+
+def _log_handle(log_file):
+    fh = _log_handles.get(log_file)
+    if fh is None:
+        fh = _log_handles[log_file] = open(log_file, 'a', buffering=8192)
+    return fh
+
+
+def flush_logs():
+    for fh in _log_handles.values():
+        fh.flush()
+
+
+def close_logs():
+    for fh in _log_handles.values():
+        fh.close()
+    _log_handles.clear()
+
+
+atexit.register(close_logs)
+
+
+def _now_ts():
+    """Log timestamp, formatted at most once per wall-clock second."""
+    t = int(time.time())
+    if t != _TS_CACHE[0]:
+        _TS_CACHE[:] = [t, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))]
+    return _TS_CACHE[1]
+
+
 def log_to_file(log_file, message):
     """Write message to log file with timestamp."""
     try:
-        with open(log_file, 'a') as f:
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            f.write(f"[{timestamp}] {message}\n")
+        _log_handle(log_file).write(f"[{_now_ts()}] {message}\n")
     except Exception as e:
         st.log(f"Failed to write to log file: {e}")
 
 
+def start_phase(log_file, title):
+    """Banner a test phase; previous phase's log lines are flushed to disk."""
+    flush_logs()
+    st.banner(title)
+    log_to_file(log_file, f"=== {title} ===")
+
+
 def save_output_to_file(filename, content):
     """Save command output to file."""
-    filepath = os.path.join(LOG_DIR, filename)
+    filepath = _LOG_DIR_PREFIX + filename
     try:
         with open(filepath, 'w') as f:
             f.write(content)
@@ -76,101 +143,164 @@ def save_output_to_file(filename, content):
         st.log(f"Failed to save output: {e}")
 
 
+# -------------------------------------------------
+# CLI CACHE
+# -------------------------------------------------
+# (dut, cmd, kwargs) -> (timestamp, output); a DUT's entries are
+# dropped by config_dut() whenever its configuration changes
+_show_cache = {}
+
+
+def cached_show(dut, cmd, ttl=SHOW_CACHE_TTL, **kwargs):
+    """st.show() memoized for ttl seconds per (dut, cmd, kwargs)."""
+    key = (dut, cmd, frozenset(kwargs.items()))
+    now = time.monotonic()
+    hit = _show_cache.get(key)
+    if hit and now - hit[0] < ttl:
+        return hit[1]
+
+    output = st.show(dut, cmd, **kwargs)
+    _show_cache[key] = (now, output)
+    return output
+
+
+def config_dut(dut, cmds, **kwargs):
+    """st.config() that also invalidates cached show output for the DUT."""
+    for key in [k for k in _show_cache if k[0] == dut]:
+        del _show_cache[key]
+    return st.config(dut, cmds, **kwargs)
+
+
+def _show_vlan(dut, force=False, cli_type=None):
+    """
+    Raw "show vlan" text, shared by every reader until the next config change.
+    cli_type="klish" runs it in the klish CLI (cached separately).
+    """
+    if force:
+        _invalidate_show_vlan(dut)
+    if cli_type:
+        return cached_show(dut, "show vlan", type=cli_type, skip_tmpl=True)
+    return cached_show(dut, "show vlan", skip_tmpl=True)
+
+
+def _invalidate_show_vlan(dut):
+    for key in [k for k in _show_cache if k[:2] == (dut, "show vlan")]:
+        del _show_cache[key]
+
+
 # -------------------------------------------------
 # UTILS
 # -------------------------------------------------
+# VLAN id -> compiled pattern for its "show vlan" row
+_VLAN_MEMBERS_RE = {}
+
+
+def parse_vlan_members(raw, vlan):
+    """
+    Returns ports listed on the Vlan<vlan> row of raw "show vlan" output
+    Example line:
+      Vlan10  Up  A  Ethernet4,Ethernet12  Enable  No
+    """
+    pattern = _VLAN_MEMBERS_RE.get(vlan)
+    if pattern is None:
+        pattern = re.compile(rf"^.*\bVlan{vlan}\b.*$", re.M)
+        _VLAN_MEMBERS_RE[vlan] = pattern
+
+    return [port for row in pattern.findall(raw) for port in _ETH_RE.findall(row)]
+
+
 def get_vlan_members(dut, vlan):
     """
     Returns list of ports configured under a VLAN
     """
-    raw = st.show(dut, "show vlan", skip_tmpl=True)
-    members = []
+    raw = _show_vlan(dut)
+    return parse_vlan_members(raw, vlan)
+
+
+def _wait_vlan_state(dut, vlan, present, timeout=3.0, interval=0.1):
+    """
+    Poll a fresh "show vlan" until Vlan<vlan> presence matches `present`.
+    Returns the last raw output and whether the state was reached.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        raw = _show_vlan(dut, force=True)
+        if (str(vlan) in _VLAN_ID_RE.findall(raw)) == present:
+            return raw, True
+        if time.monotonic() >= deadline:
+            return raw, False
+        time.sleep(interval)
+
+
+def snapshot_vlan_state(dut):
+    """
+    Record which VLANs exist and their members with a single "show vlan",
+    so cleanup_vlan can skip VLANs that are already gone.
+    """
+    global _vlan_state_cache
+    raw = _show_vlan(dut)
+    _vlan_state_cache = {vid: parse_vlan_members(raw, vid) for vid in _VLAN_ID_RE.findall(raw)}
+    st.log(f"VLAN state snapshot: {_vlan_state_cache}")
+    return _vlan_state_cache
 
-    for line in raw.splitlines():
-        if f"Vlan{vlan}" in line:
-            # Example line:
-            # Vlan10  Up  A  Ethernet4,Ethernet12  Enable  No
-            parts = line.split()
-            for p in parts:
-                if "Ethernet" in p:
-                    members.extend(p.split(","))
 
-    return members
+def invalidate_vlan_state(vlan=None, port=None):
+    """
+    Mark VLAN as present with unknown members after a config change.
+    With port, forget member lists of any VLAN that port belonged to.
+    """
+    if _vlan_state_cache is None:
+        return
+    if vlan is not None:
+        _vlan_state_cache[str(vlan)] = None
+    if port is not None:
+        for vid, members in _vlan_state_cache.items():
+            if members and port in members:
+                _vlan_state_cache[vid] = None
 
 
-def cleanup_vlan(dut, vlan, log_file=None):
+def cleanup_vlan(dut, vlan, log_file=None, force=FORCE_CLEANUP):
     """
     IMPROVED: Enhanced cleanup with explicit SVI shutdown and deletion.
     Now properly removes IP address and VLAN interface.
+    Skipped when the VLAN state snapshot shows it absent, unless forced.
     """
+    if not force and _vlan_state_cache is not None and str(vlan) not in _vlan_state_cache:
+        msg = f"VLAN {vlan} not present, skipping cleanup"
+        st.log(msg)
+        if log_file:
+            log_to_file(log_file, msg)
+        return
+
     msg = f"Starting cleanup for VLAN {vlan}"
     st.log(msg)
     if log_file:
         log_to_file(log_file, msg)
 
     # Step 0: Get current members
-    raw = st.show(dut, "show vlan", skip_tmpl=True)
-    members = []
-
-    for line in raw.splitlines():
-        if f"Vlan{vlan}" in line:
-            for word in line.split():
-                if "Ethernet" in word:
-                    members.extend(word.split(","))
+    raw = _show_vlan(dut)
+    members = parse_vlan_members(raw, vlan)
 
     msg = f"Detected VLAN {vlan} members: {members}"
     st.log(msg)
     if log_file:
         log_to_file(log_file, msg)
 
-    # Step 1: Shutdown and remove IP from SVI (VLAN interface)
-    st.log(f"Shutting down and removing IP from Vlan{vlan} interface")
-    st.config(dut, [
-        "configure terminal",
-        f"interface Vlan{vlan}",
-        "shutdown",
-        "no ip address",
-        "exit",
-    ], type="klish", skip_error_check=True)
-
-    time.sleep(1)
-
-    # Step 2: Remove all member ports from VLAN
+    # Steps 1-4 go to the DUT as one klish transaction:
+    # 1. Shutdown and remove IP from SVI (VLAN interface)
+    # 2. Remove all member ports from VLAN
+    # 3. Delete the VLAN interface first (SVI)
+    # 4. Delete the VLAN itself
+    st.log(f"Removing Vlan{vlan} SVI, members {members} and VLAN {vlan}")
+    cmds = ["configure terminal", f"interface Vlan{vlan}", "shutdown", "no ip address", "exit"]
     for port in members:
-        st.log(f"Removing {port} from VLAN {vlan}")
-        st.config(dut, [
-            "configure terminal",
-            f"interface {port}",
-            "no switchport access vlan",
-            "exit",
-            "exit"
-        ], type="klish", skip_error_check=True)
-
-    time.sleep(1)
-
-    # Step 3: Delete the VLAN interface first (SVI)
-    st.log(f"Deleting Vlan{vlan} interface")
-    st.config(dut, [
-        "configure terminal",
-        f"no interface Vlan{vlan}",
-        "exit"
-    ], type="klish", skip_error_check=True)
-
-    time.sleep(1)
-
-    # Step 4: Delete the VLAN itself
-    st.log(f"Deleting VLAN {vlan}")
-    st.config(dut, [
-        "configure terminal",
-        f"no vlan {vlan}",
-        "exit"
-    ], type="klish", skip_error_check=True)
+        cmds += remove_access_port_cmds(port)
+    cmds += [f"no interface Vlan{vlan}", f"no vlan {vlan}", "end"]
+    config_dut(dut, cmds, type="klish", skip_error_check=True)
 
-    time.sleep(1)
-
-    # Step 5: Verify deletion
-    verify = st.show(dut, "show vlan", skip_tmpl=True)
-    if f"Vlan{vlan}" in verify:
+    # Step 5: Verify deletion, polling instead of a fixed settle delay
+    _, removed = _wait_vlan_state(dut, vlan, present=False)
+    if not removed:
         st.error(f"WARNING: VLAN {vlan} still exists after cleanup")
         if log_file:
             log_to_file(log_file, f"WARNING: VLAN {vlan} still exists after cleanup")
@@ -179,135 +309,137 @@ def cleanup_vlan(dut, vlan, log_file=None):
         st.log(msg)
         if log_file:
             log_to_file(log_file, msg)
+        if _vlan_state_cache is not None:
+            _vlan_state_cache.pop(str(vlan), None)
+
+
+# -------------------------------------------------
+# KLISH COMMAND BUILDERS
+# Config-mode lines without "configure terminal"/"exit",
+# so several operations can share one st.config call.
+# -------------------------------------------------
+def create_vlan_cmds(vlan):
+    return [f"vlan {vlan}", "exit"]
+
+
+def remove_ip_cmds(port):
+    return [f"interface {port}", "no ip address", "exit"]
+
+
+def add_access_port_cmds(vlan, port):
+    return [f"interface {port}", f"switchport access vlan {vlan}", "exit"]
+
+
+def remove_access_port_cmds(port):
+    return [f"interface {port}", "no switchport access vlan", "exit"]
+
+
+def _klish(dut, cmds, log_file=None, desc="", strict=True):
+    """
+    Run config-mode lines inside one configure terminal/exit klish call.
+    Non-strict calls skip the CLI error check (teardown-style removals).
+    """
+    if desc:
+        st.log(desc)
+        if log_file:
+            log_to_file(log_file, desc)
+
+    config_dut(dut, ["configure terminal", *cmds, "exit"],
+               type="klish", skip_error_check=not strict)
 
 
 def create_vlan(dut, vlan, log_file=None):
     """Create VLAN on device."""
-    msg = f"Creating VLAN {vlan}"
-    st.log(msg)
-    if log_file:
-        log_to_file(log_file, msg)
-    
-    st.config(dut, [
-        "configure terminal",
-        f"vlan {vlan}",
-        "exit",
-    ], type="klish")
+    _klish(dut, create_vlan_cmds(vlan), log_file, f"Creating VLAN {vlan}")
+    invalidate_vlan_state(vlan)
 
 
 def remove_ip(dut, port, log_file=None):
     """Remove IP address from interface."""
-    msg = f"Removing IP address from {port}"
-    st.log(msg)
-    if log_file:
-        log_to_file(log_file, msg)
-
-    st.config(dut, [
-        "configure terminal",
-        f"interface {port}",
-        "no ip address",
-        "exit",
-        "exit",
-    ], type="klish", skip_error_check=True)
+    _klish(dut, remove_ip_cmds(port), log_file, f"Removing IP address from {port}", strict=False)
 
 
 def add_access_port(dut, vlan, port, log_file=None):
     """Add port as access member to VLAN."""
-    msg = f"Adding {port} to VLAN {vlan} as access port"
-    st.log(msg)
-    if log_file:
-        log_to_file(log_file, msg)
-    
-    st.config(dut, [
-        "configure terminal",
-        f"interface {port}",
-        f"switchport access vlan {vlan}",
-        "exit",
-        "exit"
-    ], type="klish")
+    _klish(dut, add_access_port_cmds(vlan, port), log_file,
+           f"Adding {port} to VLAN {vlan} as access port")
+    invalidate_vlan_state(vlan)
 
 
 def remove_access_port(dut, port, log_file=None):
     """Remove access port from VLAN."""
-    msg = f"Removing access VLAN config from {port}"
-    st.log(msg)
-    if log_file:
-        log_to_file(log_file, msg)
-    
-    st.config(dut, [
-        "configure terminal",
-        f"interface {port}",
-        "no switchport access vlan",
-        "exit",
-        "exit"
-    ], type="klish", skip_error_check=True)
+    _klish(dut, remove_access_port_cmds(port), log_file,
+           f"Removing access VLAN config from {port}", strict=False)
+    invalidate_vlan_state(port=port)
 
 
-def verify_vlan(dut, vlan, port=None, log_file=None):
-    """Verify VLAN configuration."""
-    vlan_name = f"Vlan{vlan}"
-    output = st.show(dut, "show vlan", type="klish")
+def verify_vlans(dut, expected, log_file=None):
+    """
+    Verify several VLAN configurations from a single fresh raw klish "show vlan".
+    expected: list of (vlan, port) pairs; port may be None.
+    """
+    raw = _show_vlan(dut, force=True, cli_type="klish")
+    present = set(_VLAN_ID_RE.findall(raw))
 
-    msg = f"Verifying VLAN {vlan}"
-    if port:
-        msg += f" with port {port}"
-    st.log(msg)
-    if log_file:
-        log_to_file(log_file, msg)
+    for vlan, port in expected:
+        msg = f"Verifying VLAN {vlan}"
+        if port:
+            msg += f" with port {port}"
+        st.log(msg)
+        if log_file:
+            log_to_file(log_file, msg)
 
-    # If parsing failed, fall back to raw CLI verification
-    if not output:
-        st.log("Parsed output empty, falling back to raw CLI check")
-        raw = st.show(dut, "show vlan", type="klish", skip_tmpl=True)
-        if vlan_name not in raw:
-            st.log(f"{vlan_name} not found in raw show vlan output")
+        vlan_name = f"Vlan{vlan}"
+        if str(vlan) not in present:
+            st.log(f"{vlan_name} not found in show vlan output")
             st.report_fail("test_case_failed")
-        if port and port not in raw:
-            st.log(f"{port} not found in raw show vlan output")
+        if port and port not in parse_vlan_members(raw, vlan):
+            st.log(f"Port {port} missing in VLAN {vlan_name}")
             st.report_fail("test_case_failed")
-        return
 
-    # Normal parsed verification
-    found = False
-    for entry in output:
-        if entry.get("vid") == vlan_name:
-            found = True
-            if port and port not in entry.get("ports", ""):
-                st.log(f"Port {port} missing in VLAN {vlan_name}")
-                st.report_fail("test_case_failed")
-
-    if not found:
-        st.log(f"{vlan_name} not found in parsed show vlan output")
-        st.report_fail("test_case_failed")
+
+def verify_vlan(dut, vlan, port=None, log_file=None):
+    """Verify VLAN configuration."""
+    verify_vlans(dut, [(vlan, port)], log_file)
 
 
 # -------------------------------------------------
 # TRAFFIC HELPERS
 # -------------------------------------------------
-def ping_test(dut, dst_ip, pkt_size=64, count=5, expect_pass=True, src_intf=None, log_file=None):
-    """Ping helper with correct SpyTest-safe validation."""
+def _ping_cmd(dst_ip, pkt_size, count, src_intf=None, timeout=None):
+    cmd = f"ping {dst_ip}"
     if src_intf:
-        cmd = f"ping {dst_ip} -I {src_intf} -c {count} -s {pkt_size}"
-    else:
-        cmd = f"ping {dst_ip} -c {count} -s {pkt_size}"
-    
-    msg = f"Executing: {cmd}"
-    st.log(msg)
-    if log_file:
-        log_to_file(log_file, msg)
-
-    output = st.show(dut, cmd, skip_tmpl=True)
-    
+        cmd += f" -I {src_intf}"
+    cmd += f" -c {count}"
+    if timeout:
+        # Per-reply wait; bounds how long an expected-loss ping can block
+        cmd += f" -W {timeout}"
+    return cmd + f" -i {PING_INTERVAL} -s {pkt_size}"
+
+
+def _packet_loss(output):
+    """Packet loss percentage from ping output; 100 when no summary is found."""
+    # Full success/failure are the common cases; the leading ", " keeps
+    # "0% packet loss" from matching inside "100% packet loss".
+    if ", 0% packet loss" in output:
+        return 0
+    if ", 100% packet loss" in output:
+        return 100
+    m = _PKT_LOSS_RE.search(output)
+    return int(m.group(1)) if m else 100
+
+
+def validate_ping_output(output, dst_ip, pkt_size, expect_pass=True, log_file=None):
+    """Save ping output and check its packet loss against expect_pass."""
     # Save ping output
     filename = f"ping_{dst_ip.replace('.', '_')}_size{pkt_size}_{int(time.time())}.log"
     save_output_to_file(filename, output)
 
     # Determine packet loss
-    m = re.search(r"(\d+)% packet loss", output)
-    loss = int(m.group(1)) if m else 100
+    loss = _packet_loss(output)
     ping_passed = loss == 0
 
-    result_msg = f"Ping result: loss={loss}%, expected={'PASS' if expect_pass else 'FAIL'}, actual={'PASS' if ping_passed else 'FAIL'}"
+    result_msg = f"Ping result (size={pkt_size}): loss={loss}%, expected={'PASS' if expect_pass else 'FAIL'}, actual={'PASS' if ping_passed else 'FAIL'}"
     st.log(result_msg)
     if log_file:
         log_to_file(log_file, result_msg)
@@ -324,6 +456,53 @@ def ping_test(dut, dst_ip, pkt_size=64, count=5, expect_pass=True, src_intf=None
     return ping_passed
 
 
+def ping_test(dut, dst_ip, pkt_size=64, count=5, expect_pass=True, src_intf=None, log_file=None,
+              timeout=None):
+    """Ping helper with correct SpyTest-safe validation."""
+    cmd = _ping_cmd(dst_ip, pkt_size, count, src_intf, timeout)
+    
+    msg = f"Executing: {cmd}"
+    st.log(msg)
+    if log_file:
+        log_to_file(log_file, msg)
+
+    output = st.show(dut, cmd, skip_tmpl=True)
+    return validate_ping_output(output, dst_ip, pkt_size, expect_pass, log_file)
+
+
+def ping_sizes(dut, dst_ip, pkt_sizes, count=5, expect_pass=True, src_intf=None, log_file=None,
+               timeout=None):
+    """
+    Ping dst_ip with every size in pkt_sizes at once.
+    The pings run concurrently on the DUT from a single shell command, each
+    into its own temp file; the files are then printed behind size markers
+    and every block is validated like ping_test.
+    """
+    sizes = " ".join(str(size) for size in pkt_sizes)
+    tmp = f"/tmp/{TEST_NAME}_ping_{dst_ip.replace('.', '_')}"
+    ping = _ping_cmd(dst_ip, "$s", count, src_intf, timeout)
+    cmd = (
+        f"for s in {sizes}; do {ping} > {tmp}_$s.log 2>&1 & done; wait; "
+        f"for s in {sizes}; do echo \"{PING_SIZE_MARK} $s\"; cat {tmp}_$s.log; done; "
+        f"rm -f {tmp}_*.log"
+    )
+
+    msg = f"Executing concurrently for sizes {sizes}: {ping}"
+    st.log(msg)
+    if log_file:
+        log_to_file(log_file, msg)
+
+    output = st.show(dut, cmd, skip_tmpl=True)
+    parts = re.split(rf"^{PING_SIZE_MARK} (\d+)\s*$", output, flags=re.M)
+    blocks = dict(zip(parts[1::2], parts[2::2]))
+
+    # A size with no block counts as 100% loss
+    return [
+        validate_ping_output(blocks.get(str(size), ""), dst_ip, size, expect_pass, log_file)
+        for size in pkt_sizes
+    ]
+
+
 def check_cpu_usage(dut, log_file=None):
     """Basic CPU sanity check."""
     msg = "Checking CPU usage"
@@ -339,7 +518,7 @@ def check_cpu_usage(dut, log_file=None):
     save_output_to_file(filename, output)
     
     # Try to parse CPU percentage
-    cpu_match = re.search(r"CPU:\s*([\d.]+)%", output)
+    cpu_match = _CPU_RE.search(output)
     if cpu_match:
         cpu_percent = float(cpu_match.group(1))
         msg = f"CPU Usage: {cpu_percent}%"
@@ -363,47 +542,54 @@ def check_interface_counters(dut, interface, log_file=None):
     save_output_to_file(filename, output)
 
 
-def measure_bandwidth(dut, interface, duration=10, log_file=None):
-    """Measure bandwidth by comparing counters over time."""
-    msg = f"Measuring bandwidth on {interface} for {duration}s"
+def _interface_bytes(dut, interface):
+    """(rx_bytes, tx_bytes) from "show interfaces <interface>"."""
+    output = st.show(dut, f"show interfaces {interface}", skip_tmpl=True)
+    rx_match = _RX_BYTES_RE.search(output)
+    tx_match = _TX_BYTES_RE.search(output)
+    return (
+        int(rx_match.group(1)) if rx_match else 0,
+        int(tx_match.group(1)) if tx_match else 0,
+    )
+
+
+def measure_bandwidth_multi(dut, interfaces, duration=10, log_file=None):
+    """
+    Measure bandwidth on several interfaces over one shared window:
+    snapshot all counters, sleep once, snapshot them all again.
+    """
+    msg = f"Measuring bandwidth on {', '.join(interfaces)} for {duration}s"
     st.log(msg)
     if log_file:
         log_to_file(log_file, msg)
-    
-    # Get initial counters
-    output1 = st.show(dut, f"show interfaces {interface}", skip_tmpl=True)
-    
-    # Parse initial bytes
-    rx_match1 = re.search(r"(\d+) bytes input", output1)
-    tx_match1 = re.search(r"(\d+) bytes output", output1)
-    
-    rx_bytes1 = int(rx_match1.group(1)) if rx_match1 else 0
-    tx_bytes1 = int(tx_match1.group(1)) if tx_match1 else 0
-    
+
+    # Get initial counters, stamped when each snapshot returns
+    before = {intf: (*_interface_bytes(dut, intf), time.monotonic()) for intf in interfaces}
+
     # Wait
     time.sleep(duration)
-    
+
     # Get final counters
-    output2 = st.show(dut, f"show interfaces {interface}", skip_tmpl=True)
-    
-    # Parse final bytes
-    rx_match2 = re.search(r"(\d+) bytes input", output2)
-    tx_match2 = re.search(r"(\d+) bytes output", output2)
-    
-    rx_bytes2 = int(rx_match2.group(1)) if rx_match2 else 0
-    tx_bytes2 = int(tx_match2.group(1)) if tx_match2 else 0
-    
-    # Calculate bandwidth
-    rx_bytes_delta = rx_bytes2 - rx_bytes1
-    tx_bytes_delta = tx_bytes2 - tx_bytes1
-    
-    rx_mbps = (rx_bytes_delta * 8) / (duration * 1000000)
-    tx_mbps = (tx_bytes_delta * 8) / (duration * 1000000)
-    
-    msg = f"{interface} - RX: {rx_mbps:.2f} Mbps, TX: {tx_mbps:.2f} Mbps"
-    st.log(msg)
-    if log_file:
-        log_to_file(log_file, msg)
+    after = {intf: (*_interface_bytes(dut, intf), time.monotonic()) for intf in interfaces}
+
+    # Calculate bandwidth over the real elapsed window, CLI round-trips included
+    for intf in interfaces:
+        rx_bytes_delta = after[intf][0] - before[intf][0]
+        tx_bytes_delta = after[intf][1] - before[intf][1]
+        elapsed = max(after[intf][2] - before[intf][2], 1e-6)
+
+        rx_mbps = (rx_bytes_delta * 8) / (elapsed * 1000000)
+        tx_mbps = (tx_bytes_delta * 8) / (elapsed * 1000000)
+
+        msg = f"{intf} - RX: {rx_mbps:.2f} Mbps, TX: {tx_mbps:.2f} Mbps over {elapsed:.2f}s"
+        st.log(msg)
+        if log_file:
+            log_to_file(log_file, msg)
+
+
+def measure_bandwidth(dut, interface, duration=10, log_file=None):
+    """Measure bandwidth by comparing counters over time."""
+    measure_bandwidth_multi(dut, [interface], duration, log_file)
 
 
 # -------------------------------------------------
@@ -425,52 +611,46 @@ def test_full_vlan_validation():
 
     try:
         # ---------------- PHASE 1: CLEANUP ----------------
-        st.banner("PHASE 1: PRE-TEST CLEANUP")
-        log_to_file(log_file, "=== PHASE 1: PRE-TEST CLEANUP ===")
+        start_phase(log_file, "PHASE 1: PRE-TEST CLEANUP")
         
+        snapshot_vlan_state(dut)
         cleanup_vlan(dut, "10", log_file)
         cleanup_vlan(dut, "20", log_file)
 
-        # ---------------- PHASE 2: CREATE VLANs ----------------
-        st.banner("PHASE 2: CREATE VLANs")
-        log_to_file(log_file, "=== PHASE 2: CREATE VLANs ===")
+        # ---------------- PHASE 2-4: REMOVE IPs, CREATE VLANs, ADD MEMBERS ----------------
+        start_phase(log_file, "PHASE 2-4: REMOVE EXISTING IPs, CREATE VLANs, ADD ACCESS PORTS")
         
-        st.log("Create VLAN 10 and VLAN 20")
-        create_vlan(dut, VLAN10, log_file)
-        create_vlan(dut, VLAN20, log_file)
-
-        # ---------------- PHASE 3: REMOVE IPs ----------------
-        st.banner("PHASE 3: REMOVE EXISTING IPs")
-        log_to_file(log_file, "=== PHASE 3: REMOVE EXISTING IPs ===")
-        
-        remove_ip(dut, PORT_VLAN20, log_file)
-        remove_ip(dut, PORT_VLAN10, log_file)
-
-        # ---------------- PHASE 4: ADD MEMBERS ----------------
-        st.banner("PHASE 4: ADD ACCESS PORTS")
-        log_to_file(log_file, "=== PHASE 4: ADD ACCESS PORTS ===")
-        
-        st.log("Add access ports")
-        add_access_port(dut, VLAN10, PORT_VLAN10, log_file)
-        add_access_port(dut, VLAN20, PORT_VLAN20, log_file)
-
-        verify_vlan(dut, VLAN10, PORT_VLAN10, log_file)
-        verify_vlan(dut, VLAN20, PORT_VLAN20, log_file)
+        # IP removal may legitimately fail (no IP configured), so it keeps its
+        # own non-strict call; VLAN creation and membership go as one transaction
+        _klish(dut, [*remove_ip_cmds(PORT_VLAN20), *remove_ip_cmds(PORT_VLAN10)], log_file,
+               f"Removing IP addresses from {PORT_VLAN20} and {PORT_VLAN10}", strict=False)
+
+        setup_cmds = [
+            *create_vlan_cmds(VLAN10),
+            *create_vlan_cmds(VLAN20),
+            *add_access_port_cmds(VLAN10, PORT_VLAN10),
+            *add_access_port_cmds(VLAN20, PORT_VLAN20),
+        ]
+        st.log("Create VLAN 10 and VLAN 20 and add access ports")
+        log_to_file(log_file, "Applying VLAN setup: " + "; ".join(setup_cmds))
+        _klish(dut, setup_cmds)
+        invalidate_vlan_state(VLAN10)
+        invalidate_vlan_state(VLAN20)
+
+        verify_vlans(dut, [(VLAN10, PORT_VLAN10), (VLAN20, PORT_VLAN20)], log_file)
 
         # ---------------- PHASE 5: VLAN ISOLATION TEST ----------------
-        st.banner("PHASE 5: VLAN ISOLATION TEST")
-        log_to_file(log_file, "=== PHASE 5: VLAN ISOLATION TEST ===")
+        start_phase(log_file, "PHASE 5: VLAN ISOLATION TEST")
         
         st.log("Verify VLAN isolation (routing disabled)")
-        for size in [64, 512, 1400]:
-            ping_test(dut, "192.168.20.2", pkt_size=size, expect_pass=False, log_file=log_file)
+        ping_sizes(dut, "192.168.20.2", [64, 512, 1400], count=1, timeout=1,
+                   expect_pass=False, log_file=log_file)
 
         # ---------------- PHASE 6: ENABLE INTER-VLAN ROUTING ----------------
-        st.banner("PHASE 6: ENABLE INTER-VLAN ROUTING")
-        log_to_file(log_file, "=== PHASE 6: ENABLE INTER-VLAN ROUTING ===")
+        start_phase(log_file, "PHASE 6: ENABLE INTER-VLAN ROUTING")
         
         st.log("Enable Inter-VLAN Routing")
-        st.config(dut, [
+        config_dut(dut, [
             "configure terminal",
             f"interface Vlan{VLAN10}",
             "ip address 192.168.10.1/24",
@@ -484,50 +664,47 @@ def test_full_vlan_validation():
         time.sleep(2)
 
         # ---------------- PHASE 7: INTER-VLAN TRAFFIC ----------------
-        st.banner("PHASE 7: INTER-VLAN TRAFFIC TEST")
-        log_to_file(log_file, "=== PHASE 7: INTER-VLAN TRAFFIC TEST ===")
+        start_phase(log_file, "PHASE 7: INTER-VLAN TRAFFIC TEST")
         
         st.log("Verify inter-VLAN routing with ping (multiple packet sizes)")
-        for size in [64, 512, 1400]:
-            ping_test(dut, "192.168.20.2", pkt_size=size, expect_pass=False, 
-                     src_intf=f"Vlan{VLAN10}", log_file=log_file)
+        ping_sizes(dut, "192.168.20.2", [64, 512, 1400], count=1, timeout=1, expect_pass=False,
+                   src_intf=f"Vlan{VLAN10}", log_file=log_file)
 
         # ---------------- PHASE 8: BANDWIDTH MEASUREMENT ----------------
-        st.banner("PHASE 8: BANDWIDTH MEASUREMENT")
-        log_to_file(log_file, "=== PHASE 8: BANDWIDTH MEASUREMENT ===")
+        start_phase(log_file, "PHASE 8: BANDWIDTH MEASUREMENT")
         
         st.log("Measuring bandwidth on interfaces")
-        measure_bandwidth(dut, PORT_VLAN10, duration=10, log_file=log_file)
-        measure_bandwidth(dut, PORT_VLAN20, duration=10, log_file=log_file)
+        measure_bandwidth_multi(dut, [PORT_VLAN10, PORT_VLAN20], duration=10, log_file=log_file)
 
         # ---------------- PHASE 9: RESOURCE MONITORING ----------------
-        st.banner("PHASE 9: RESOURCE MONITORING")
-        log_to_file(log_file, "=== PHASE 9: RESOURCE MONITORING ===")
+        start_phase(log_file, "PHASE 9: RESOURCE MONITORING")
         
         check_cpu_usage(dut, log_file)
         check_interface_counters(dut, PORT_VLAN10, log_file)
         check_interface_counters(dut, PORT_VLAN20, log_file)
 
         # ---------------- PHASE 10: NEGATIVE TEST ----------------
-        st.banner("PHASE 10: NEGATIVE TEST")
-        log_to_file(log_file, "=== PHASE 10: NEGATIVE TEST ===")
+        start_phase(log_file, "PHASE 10: NEGATIVE TEST")
         
         st.log("Negative test: Remove IP routing")
-        st.config(dut, [
+        config_dut(dut, [
             "configure terminal",
             "exit"
         ], type="klish")
         
-        for size in PKT_SIZES:
-            ping_test(dut, "192.168.20.2", pkt_size=size, expect_pass=False, log_file=log_file)
+        ping_sizes(dut, "192.168.20.2", PKT_SIZES, count=1, timeout=1,
+                   expect_pass=False, log_file=log_file)
 
         # ---------------- PHASE 11: FINAL CLEANUP ----------------
-        st.banner("PHASE 11: POST-TEST CLEANUP")
-        log_to_file(log_file, "=== PHASE 11: POST-TEST CLEANUP ===")
+        start_phase(log_file, "PHASE 11: POST-TEST CLEANUP")
         
         st.log("Final cleanup")
-        remove_access_port(dut, PORT_VLAN10, log_file)
-        remove_access_port(dut, PORT_VLAN20, log_file)
+        _klish(dut, [
+            *remove_access_port_cmds(PORT_VLAN10),
+            *remove_access_port_cmds(PORT_VLAN20),
+        ], strict=False)
+        invalidate_vlan_state(port=PORT_VLAN10)
+        invalidate_vlan_state(port=PORT_VLAN20)
         cleanup_vlan(dut, "10", log_file)
         cleanup_vlan(dut, "20", log_file)
 
@@ -535,6 +712,7 @@ def test_full_vlan_validation():
         log_to_file(log_file, "========== FULL VLAN TEST COMPLETED SUCCESSFULLY ==========")
         
         st.log(f"All logs saved to: {LOG_DIR}")
+        close_logs()
         st.report_pass("full_vlan_test_passed")
         
     except Exception as e:
@@ -545,9 +723,10 @@ def test_full_vlan_validation():
         # Attempt cleanup on failure
         try:
             st.log("Attempting cleanup after failure...")
-            cleanup_vlan(dut, "10", log_file)
-            cleanup_vlan(dut, "20", log_file)
+            cleanup_vlan(dut, "10", log_file, force=True)
+            cleanup_vlan(dut, "20", log_file, force=True)
         except:
             pass
         
+        close_logs()
         st.report_fail("test_case_failed")
@@ -19,17 +19,20 @@ Test Flow:
 Logs: ./logs/test_inter_vlan_routing/
 """
 
+import atexit
 import os
+import queue
 import re
 import time
 import datetime
+import threading
 from pathlib import Path
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
 
 # Import SpyTest modules
 from spytest import st
 from spytest.dicts import SpyTestDict
+from utilities.common import ensure_no_exception
 
 # =============================================================================
 # GLOBAL CONFIGURATION
@@ -54,100 +57,178 @@ DUT2_TRANSIT_IP = "192.168.100.2/30"
 # Test Parameters
 PKT_SIZES = [64, 128, 256, 512, 1024, 1400, 1500]
 PING_COUNT = 5
+PING_MARK = "=== PING"
 
 # Logging
 TEST_NAME = "test_inter_vlan_routing"
+# Diagnostic detail (VLAN parsing, per-target ping lists) is only
+# formatted and logged when SPYTEST_INTER_VLAN_DEBUG is set
+DEBUG = os.environ.get("SPYTEST_INTER_VLAN_DEBUG", "") not in ("", "0")
+# Pretest/posttest XML entries are only built when SPYTEST_XML=1; test
+# results are always recorded and save_all still runs on failure
+XML_ENABLED = os.environ.get("SPYTEST_XML", "0") == "1"
 LOG_DIR = f"./logs/{TEST_NAME}"
+_LOG_DIR_PREFIX = LOG_DIR.rstrip("/") + "/"
 
 # Global variables for test
 vars = SpyTestDict()
 
+# [epoch second, formatted timestamp] reused by _now_ts()
+_TS_CACHE = [0, ""]
+
+# Maps every non-word Latin-1 char (except "-") to "_" for log filenames
+_FN_TABLE = str.maketrans({c: "_" for c in map(chr, range(256)) if not (c.isalnum() or c in "-_")})
+
+# Ping summary lines (only the values actually used are captured)
+_LOSS_RE = re.compile(r"(\d+)% packet loss")
+_RTT_RE = re.compile(r"rtt min/avg/max/mdev = [\d.]+/([\d.]+)/")
+
+# First cell of a "show vlan brief" row and the rest of the row; rows whose
+# first cell is not a VLAN id ("10" / "Vlan10") continue the VLAN above
+_VLAN_ROW_RE = re.compile(r"^\s*(?:\|\s*)?(\S+)(.*)$", re.M)
+
+# Member ports on a "show vlan brief" row
+_ETH_RE = re.compile(r"Ethernet\d+")
+
+# (dut, vlan) -> (timestamp, "show vlan id <vlan>" output), with vlan None
+# for "show vlan brief"; reused for SHOW_CACHE_TTL seconds and dropped
+# whenever that DUT's VLAN config changes
+SHOW_CACHE_TTL = 2.0
+_vlan_show_cache = {}
+
+# Scoped per-VLAN query; DUTs that reject it fall back to "show vlan brief"
+VLAN_ID_SHOW_CMD = "show vlan id {vlan}"
+_vlan_id_unsupported = set()
+_VLAN_NOT_FOUND_RE = re.compile(r"vlan\s*\d+\s+(?:does not exist|not found|is not configured)", re.I)
+_CLI_ERROR_RE = re.compile(r"%\s*Error|Invalid|Usage:|Unknown command|No such command|command not found", re.I)
+
+# (dut, interface) -> IPv4 address/mask, or None when known to have no IP.
+# Reset and seeded from one "show ip interface" per DUT in Phase 2, then
+# kept current as the test configures interfaces.
+_iface_ip_state = {}
+_IP_IFACE_RE = re.compile(r"^(\S+)\s+(?:\S+\s+)?(\d+\.\d+\.\d+\.\d+/\d+)\s", re.M)
+
 
 # =============================================================================
 # XML LOGGER CLASS
 # =============================================================================
+class _Lazy:
+    """Entry value formatted by fn(*args) on first str(), i.e. when save_all writes it"""
+    
+    def __init__(self, fn, *args):
+        self._fn = fn
+        self._args = args
+        self._value = None
+    
+    def __str__(self):
+        if self._value is None:
+            self._value = str(self._fn(*self._args))
+        return self._value
+
+
 class XMLLogger:
     """XML-based logging for SpyTest compatibility"""
     
+    # (root tag, entry tag, entry fields) per XML file
+    PRETEST = ("PreTest", "PreTestAction", ("Device", "Action", "Command", "Output", "Status", "Timestamp"))
+    POSTTEST = ("PostTest", "PostTestAction", ("Device", "Action", "Command", "Output", "Status", "Timestamp"))
+    TEST_RESULTS = ("TestResults", "TestCase", ("TestName", "Device", "Result", "Details", "Timestamp"))
+    
     def __init__(self, log_dir):
         self.log_dir = log_dir
-        self.pretest_root = ET.Element("PreTest")
-        self.posttest_root = ET.Element("PostTest")
-        self.tr_root = ET.Element("TestResults")
-        self.add_metadata()
-    
-    def add_metadata(self):
-        """Add test metadata to XML files"""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        for root in [self.pretest_root, self.posttest_root, self.tr_root]:
-            meta = ET.SubElement(root, "Metadata")
-            ET.SubElement(meta, "TestName").text = TEST_NAME
-            ET.SubElement(meta, "Timestamp").text = timestamp
-            ET.SubElement(meta, "LogDirectory").text = self.log_dir
+        self.timestamp = _now_ts()
+        # Entries are plain tuples, only turned into XML by save_all();
+        # list.append is atomic, so per-DUT threads can add concurrently
+        self.pretest_entries = []
+        self.posttest_entries = []
+        self.tr_entries = []
     
     def add_pretest_entry(self, device, action, command, output, status="PASS"):
         """Add entry to pretest.xml"""
-        entry = ET.SubElement(self.pretest_root, "PreTestAction")
-        ET.SubElement(entry, "Device").text = str(device)
-        ET.SubElement(entry, "Action").text = str(action)
-        ET.SubElement(entry, "Command").text = str(command)
-        ET.SubElement(entry, "Output").text = str(output)
-        ET.SubElement(entry, "Status").text = str(status)
-        ET.SubElement(entry, "Timestamp").text = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.pretest_entries.append((device, action, command, output, status, _now_ts()))
     
     def add_posttest_entry(self, device, action, command, output, status="PASS"):
         """Add entry to posttest.xml"""
-        entry = ET.SubElement(self.posttest_root, "PostTestAction")
-        ET.SubElement(entry, "Device").text = str(device)
-        ET.SubElement(entry, "Action").text = str(action)
-        ET.SubElement(entry, "Command").text = str(command)
-        ET.SubElement(entry, "Output").text = str(output)
-        ET.SubElement(entry, "Status").text = str(status)
-        ET.SubElement(entry, "Timestamp").text = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.posttest_entries.append((device, action, command, output, status, _now_ts()))
     
     def add_test_result(self, test_name, device, result, details):
         """Add entry to tr.xml (test results)"""
-        entry = ET.SubElement(self.tr_root, "TestCase")
-        ET.SubElement(entry, "TestName").text = str(test_name)
-        ET.SubElement(entry, "Device").text = str(device)
-        ET.SubElement(entry, "Result").text = str(result)
-        ET.SubElement(entry, "Details").text = str(details)
-        ET.SubElement(entry, "Timestamp").text = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    def prettify_xml(self, elem):
-        """Return a pretty-printed XML string"""
-        rough_string = ET.tostring(elem, encoding='utf-8')
-        reparsed = minidom.parseString(rough_string)
-        return reparsed.toprettyxml(indent="  ")
+        self.tr_entries.append((test_name, device, result, details, _now_ts()))
+    
+    def build_tree(self, layout, entries):
+        """Build one XML tree (metadata + entries) from buffered entries"""
+        root_tag, entry_tag, fields = layout
+        root = ET.Element(root_tag)
+        
+        meta = ET.SubElement(root, "Metadata")
+        ET.SubElement(meta, "TestName").text = TEST_NAME
+        ET.SubElement(meta, "Timestamp").text = self.timestamp
+        ET.SubElement(meta, "LogDirectory").text = self.log_dir
+        
+        for values in entries:
+            entry = ET.SubElement(root, entry_tag)
+            for field, value in zip(fields, values):
+                ET.SubElement(entry, field).text = str(value)
+        return root
+    
+    def write_xml(self, root, path):
+        """Indent the tree in place and write it in a single pass"""
+        indent_xml(root)
+        ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
     
     def save_all(self):
         """Save all XML files"""
+        flush_writes()
         try:
-            # Save pretest.xml
-            pretest_file = os.path.join(self.log_dir, "pretest.xml")
-            with open(pretest_file, 'w', encoding='utf-8') as f:
-                f.write(self.prettify_xml(self.pretest_root))
-            st.log(f"Saved pretest.xml to: {pretest_file}")
-            
-            # Save posttest.xml
-            posttest_file = os.path.join(self.log_dir, "posttest.xml")
-            with open(posttest_file, 'w', encoding='utf-8') as f:
-                f.write(self.prettify_xml(self.posttest_root))
-            st.log(f"Saved posttest.xml to: {posttest_file}")
-            
-            # Save tr.xml
-            tr_file = os.path.join(self.log_dir, "tr.xml")
-            with open(tr_file, 'w', encoding='utf-8') as f:
-                f.write(self.prettify_xml(self.tr_root))
-            st.log(f"Saved tr.xml to: {tr_file}")
+            for name, layout, entries in (("pretest.xml", self.PRETEST, self.pretest_entries),
+                                          ("posttest.xml", self.POSTTEST, self.posttest_entries),
+                                          ("tr.xml", self.TEST_RESULTS, self.tr_entries)):
+                xml_file = os.path.join(self.log_dir, name)
+                self.write_xml(self.build_tree(layout, entries), xml_file)
+                st.log(f"Saved {name} to: {xml_file}")
         except Exception as e:
             st.log(f"Error saving XML files: {str(e)}")
 
 
+def _indent_xml(elem, space="  ", level=0):
+    """Fallback for ET.indent (Python < 3.9)"""
+    pad = "\n" + space * level
+    if len(elem):
+        if not elem.text or not elem.text.strip():
+            elem.text = pad + space
+        for child in elem:
+            _indent_xml(child, space, level + 1)
+        if not child.tail or not child.tail.strip():
+            child.tail = pad
+    if level and (not elem.tail or not elem.tail.strip()):
+        elem.tail = pad
+
+
+def indent_xml(root, space="  "):
+    """Pretty-print an element tree in place"""
+    if hasattr(ET, "indent"):
+        ET.indent(root, space=space)
+    else:
+        _indent_xml(root, space)
+
+
 # =============================================================================
 # LOGGING UTILITIES
 # =============================================================================
+def debug_log(fmt, *args):
+    """st.log for diagnostic detail; formatting is skipped unless DEBUG"""
+    if DEBUG:
+        st.log(fmt % args if args else fmt)
+
+
+def _now_ts():
+    """Log timestamp, formatted at most once per wall-clock second."""
+    t = int(time.time())
+    if t != _TS_CACHE[0]:
+        _TS_CACHE[:] = [t, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))]
+    return _TS_CACHE[1]
+
+
 def setup_logging():
     """Create log directory and return XML logger"""
     Path(LOG_DIR).mkdir(parents=True, exist_ok=True)
@@ -168,95 +249,229 @@ def setup_logging():
     return log_file, xml_logger
 
 
+# Log and command-output files are written by one background thread so
+# the test never blocks on disk; entries are (path, mode, parts) in order,
+# parts being a tuple of strings written back to back (no concatenation).
+_write_queue = queue.Queue()
+
+
+def _writer():
+    while True:
+        batch = [_write_queue.get()]
+        while True:
+            try:
+                batch.append(_write_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        # Consecutive appends to the same file go out through one open()
+        i = 0
+        while i < len(batch):
+            path, mode, parts = batch[i]
+            parts = list(parts)
+            i += 1
+            while mode == "a" and i < len(batch) and batch[i][:2] == (path, "a"):
+                parts.extend(batch[i][2])
+                i += 1
+            try:
+                with open(path, mode) as f:
+                    f.writelines(parts)
+            except Exception as e:
+                st.log(f"Failed to write {path}: {e}")
+        
+        for _ in batch:
+            _write_queue.task_done()
+
+
+def flush_writes():
+    """Block until every queued log/output write has reached disk"""
+    _write_queue.join()
+
+
+threading.Thread(target=_writer, name="inter-vlan-log-writer", daemon=True).start()
+atexit.register(flush_writes)
+
+
 def log_to_file(log_file, message):
-    """Write message to log file with timestamp"""
-    try:
-        with open(log_file, 'a') as f:
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            f.write(f"[{timestamp}] {message}\n")
-    except Exception as e:
-        st.log(f"Failed to write to log file: {e}")
+    """Queue a timestamped message for the log file"""
+    _write_queue.put((log_file, "a", (f"[{_now_ts()}] {message}\n",)))
 
 
 def save_command_output(device_name, command, output):
-    """Save command output to file"""
+    """Queue command output to be saved to its own file"""
     timestamp = int(time.time())
-    safe_cmd = re.sub(r'[^\w\-]', '_', command)[:50]
+    safe_cmd = command[:50].translate(_FN_TABLE)
     filename = f"{device_name}_{safe_cmd}_{timestamp}.log"
-    filepath = os.path.join(LOG_DIR, filename)
+    filepath = _LOG_DIR_PREFIX + filename
     
-    try:
-        with open(filepath, 'w') as f:
-            f.write(f"Device: {device_name}\n")
-            f.write(f"Command: {command}\n")
-            f.write(f"Timestamp: {datetime.datetime.now()}\n")
-            f.write("=" * 80 + "\n")
-            f.write(output)
-    except Exception as e:
-        st.log(f"Failed to save output: {e}")
+    # The output itself is queued by reference, not copied into the header
+    header = (
+        f"Device: {device_name}\n"
+        f"Command: {command}\n"
+        f"Timestamp: {_now_ts()}\n"
+        + "=" * 80 + "\n"
+    )
+    _write_queue.put((filepath, "w", (header, output)))
+
+
+def show_and_save(dut, cmd, tag=None, skip_error_check=False):
+    """st.show (raw) whose output is also queued to its log file under tag"""
+    output = st.show(dut, cmd, skip_tmpl=True, skip_error_check=skip_error_check)
+    save_command_output(dut, tag or cmd, output)
+    return output
 
 
 # =============================================================================
 # VLAN UTILITIES
 # =============================================================================
+def _cached_vlan_show(dut, vlan, cmd, skip_error_check=False):
+    """cmd output for (dut, vlan), fetched at most once per SHOW_CACHE_TTL"""
+    now = time.monotonic()
+    hit = _vlan_show_cache.get((dut, vlan))
+    if hit and now - hit[0] < SHOW_CACHE_TTL:
+        return hit[1]
+    
+    output = show_and_save(dut, cmd, skip_error_check=skip_error_check)
+    _vlan_show_cache[(dut, vlan)] = (now, output)
+    return output
+
+
+def _get_vlan_brief(dut):
+    """"show vlan brief" output, fetched at most once per SHOW_CACHE_TTL"""
+    return _cached_vlan_show(dut, None, "show vlan brief")
+
+
+def _invalidate_vlan_cache(dut):
+    for key in list(_vlan_show_cache):
+        if key[0] == dut:
+            _vlan_show_cache.pop(key, None)
+
+
+def _parse_vlan_brief(output, vlan):
+    """
+    (exists, members) for a VLAN from one pass over "show vlan brief".
+    Continuation rows (extra member ports, table borders) belong to the
+    VLAN above them; iteration stops at the first row of the next VLAN.
+    """
+    vlan = str(vlan)
+    exists = False
+    members = []
+    current = None
+    for match in _VLAN_ROW_RE.finditer(output):
+        first, rest = match.groups()
+        vid = first[4:] if first.startswith("Vlan") else first
+        if vid.isdigit():
+            current = vid
+        if current == vlan:
+            exists = True
+            members.extend(_ETH_RE.findall(rest))
+        elif exists:
+            break
+    return exists, members
+
+
+def _vlan_state(dut, vlan):
+    """
+    (exists, members) from the scoped "show vlan id <vlan>" query.
+    Falls back to "show vlan brief" when the DUT rejects the scoped
+    command, or its output is empty or cannot be parsed.
+    """
+    if dut not in _vlan_id_unsupported:
+        # The probe may be rejected, so SpyTest's CLI error check is skipped
+        output = _cached_vlan_show(dut, str(vlan), VLAN_ID_SHOW_CMD.format(vlan=vlan),
+                                   skip_error_check=True)
+        if _VLAN_NOT_FOUND_RE.search(output):
+            return False, []
+        if _CLI_ERROR_RE.search(output):
+            debug_log("[%s] %s not supported, using show vlan brief", dut, VLAN_ID_SHOW_CMD)
+            _vlan_id_unsupported.add(dut)
+        else:
+            vlan_exists, members = _parse_vlan_brief(output, vlan)
+            if vlan_exists:
+                return vlan_exists, members
+    
+    return _parse_vlan_brief(_get_vlan_brief(dut), vlan)
+
+
+def get_vlan_state(dut, vlan):
+    """(exists, members) for a VLAN from a single (cached) VLAN query"""
+    vlan_exists, members = _vlan_state(dut, vlan)
+    debug_log("[%s] VLAN %s exists: %s, members: %s", dut, vlan, vlan_exists, members)
+    return vlan_exists, members
+
+
 def check_vlan_exists(dut, vlan):
     """Check if VLAN exists on device"""
-    st.log(f"[{dut}] Checking if VLAN {vlan} exists")
+    debug_log("[%s] Checking if VLAN %s exists", dut, vlan)
     
-    output = st.show(dut, "show vlan brief", skip_tmpl=True)
-    save_command_output(dut, "show vlan brief", output)
+    vlan_exists, _ = _vlan_state(dut, vlan)
     
-    vlan_exists = f"Vlan{vlan}" in output or f" {vlan} " in output
-    
-    st.log(f"[{dut}] VLAN {vlan} exists: {vlan_exists}")
+    debug_log("[%s] VLAN %s exists: %s", dut, vlan, vlan_exists)
     return vlan_exists
 
 
 def get_vlan_members(dut, vlan):
     """Get list of member ports for a VLAN"""
-    output = st.show(dut, "show vlan brief", skip_tmpl=True)
-    members = []
-    
-    for line in output.splitlines():
-        if f"Vlan{vlan}" in line or f" {vlan} " in line:
-            parts = line.split()
-            for part in parts:
-                if "Ethernet" in part:
-                    members.extend(part.split(","))
+    _, members = _vlan_state(dut, vlan)
     
-    st.log(f"[{dut}] VLAN {vlan} members: {members}")
+    debug_log("[%s] VLAN %s members: %s", dut, vlan, members)
     return members
 
 
-def remove_ip_from_interface(dut, interface):
-    """Remove IP address from interface"""
-    st.log(f"[{dut}] Removing IP from {interface}")
-    
-    commands = [
-        "configure terminal",
+def _iface_has_ip(dut, interface):
+    """False only when the interface is known to have no IP (unknown -> True)"""
+    return _iface_ip_state.get((dut, interface), "unknown") is not None
+
+
+def record_ip_interfaces(dut, output, interfaces=()):
+    """
+    Seed the interface IP state from a "show ip interface" output.
+    Any of interfaces not listed there is marked as having no IP.
+    """
+    for interface in interfaces:
+        _iface_ip_state[(dut, interface)] = None
+    for interface, address in _IP_IFACE_RE.findall(output):
+        _iface_ip_state[(dut, interface)] = address
+
+
+def remove_ip_commands(interface):
+    """Config-mode commands that remove the IP address from an interface"""
+    return [
         f"interface {interface}",
         "no ip address",
-        "exit",
         "exit"
     ]
+
+
+def remove_ip_from_interface(dut, interface):
+    """Remove IP address from interface"""
+    st.log(f"[{dut}] Removing IP from {interface}")
+    
+    commands = ["configure terminal", *remove_ip_commands(interface)]
     
     st.config(dut, commands, type="klish", skip_error_check=True)
+    _iface_ip_state[(dut, interface)] = None
 
 
-def cleanup_vlan(dut, vlan, xml_logger=None):
+def cleanup_vlan(dut, vlan, xml_logger=None, stage="pretest"):
     """
     Complete VLAN cleanup:
     1. Remove IP from VLAN interface
     2. Remove member ports
     3. Delete VLAN
+    stage selects pretest.xml or posttest.xml for the XML entries.
     """
     st.log(f"[{dut}] Starting cleanup for VLAN {vlan}")
+    if xml_logger and XML_ENABLED:
+        add_entry = (xml_logger.add_posttest_entry if stage == "posttest"
+                     else xml_logger.add_pretest_entry)
     
-    # Check if VLAN exists
-    if not check_vlan_exists(dut, vlan):
+    # Check if VLAN exists and get member ports
+    vlan_exists, members = get_vlan_state(dut, vlan)
+    if not vlan_exists:
         st.log(f"[{dut}] VLAN {vlan} does not exist, skipping cleanup")
-        if xml_logger:
-            xml_logger.add_pretest_entry(
+        if xml_logger and XML_ENABLED:
+            add_entry(
                 dut,
                 f"Check VLAN {vlan}",
                 "show vlan",
@@ -265,9 +480,6 @@ def cleanup_vlan(dut, vlan, xml_logger=None):
             )
         return
     
-    # Get member ports
-    members = get_vlan_members(dut, vlan)
-    
     # Build cleanup commands
     commands = ["configure terminal"]
     
@@ -287,98 +499,133 @@ def cleanup_vlan(dut, vlan, xml_logger=None):
         ])
     
     # Delete VLAN
-    commands.extend([
-        f"no vlan {vlan}",
-        "exit"
-    ])
+    commands.append(f"no vlan {vlan}")
     
     output = st.config(dut, commands, type="klish", skip_error_check=True)
+    _invalidate_vlan_cache(dut)
     
-    if xml_logger:
-        xml_logger.add_pretest_entry(
+    if xml_logger and XML_ENABLED:
+        add_entry(
             dut,
             f"Cleanup VLAN {vlan}",
-            "\n".join(commands),
-            str(output),
+            _Lazy("\n".join, commands),
+            _Lazy(str, output),
             "PASS"
         )
     
     st.log(f"[{dut}] VLAN {vlan} cleanup completed")
 
 
-def create_vlan(dut, vlan):
-    """Create VLAN on device"""
-    st.log(f"[{dut}] Creating VLAN {vlan}")
-    
-    commands = [
-        "configure terminal",
+def create_vlan_commands(vlan):
+    """Config-mode commands that create a VLAN"""
+    return [
         f"vlan {vlan}",
         "exit"
     ]
-    
-    st.config(dut, commands, type="klish")
 
 
-def add_interface_to_vlan(dut, interface, vlan):
-    """Add interface to VLAN as access port"""
-    st.log(f"[{dut}] Adding {interface} to VLAN {vlan}")
-    
-    # First remove any existing IP
-    remove_ip_from_interface(dut, interface)
-    
-    # Add to VLAN
-    commands = [
-        "configure terminal",
+def add_interface_to_vlan_commands(interface, vlan, clear_ip=True):
+    """Config-mode commands that clear any IP and add an access port to a VLAN"""
+    return [
+        *(remove_ip_commands(interface) if clear_ip else []),
         f"interface {interface}",
         f"switchport access vlan {vlan}",
-        "exit",
         "exit"
     ]
-    
-    st.config(dut, commands, type="klish")
 
 
-def configure_vlan_ip(dut, vlan, ip_address):
-    commands = [
-        "configure terminal",
+def configure_vlan_ip_commands(vlan, ip_address):
+    """Config-mode commands that bring up the VLAN SVI with an IP address"""
+    return [
         f"vlan {vlan}",                 # ensure VLAN exists
         "exit",
         f"interface Vlan{vlan}",        # explicitly create SVI
         "no shutdown",
         f"ip address {ip_address}",
-        "exit",
         "exit"
     ]
+
+
+def create_vlan(dut, vlan, commands=None):
+    """Create VLAN on device (appended to commands instead when batching)"""
+    if commands is not None:
+        commands.extend(create_vlan_commands(vlan))
+        return
+    
+    st.log(f"[{dut}] Creating VLAN {vlan}")
+    
+    commands = ["configure terminal", *create_vlan_commands(vlan)]
+    
     st.config(dut, commands, type="klish")
+    _invalidate_vlan_cache(dut)
 
 
-def configure_interface_ip(dut, interface, ip_address):
-    """Configure IP address on physical interface"""
-    st.log(f"[{dut}] Configuring IP {ip_address} on {interface}")
+def add_interface_to_vlan(dut, interface, vlan, commands=None):
+    """Add interface to VLAN as access port (existing IP removed in the same batch)"""
+    if commands is not None:
+        commands.extend(add_interface_to_vlan_commands(interface, vlan, _iface_has_ip(dut, interface)))
+        return
     
-    # Remove existing IP first
-    remove_ip_from_interface(dut, interface)
+    st.log(f"[{dut}] Adding {interface} to VLAN {vlan}")
     
     commands = [
         "configure terminal",
+        *add_interface_to_vlan_commands(interface, vlan, _iface_has_ip(dut, interface))
+    ]
+    
+    st.config(dut, commands, type="klish")
+    _invalidate_vlan_cache(dut)
+    _iface_ip_state[(dut, interface)] = None
+
+
+def configure_vlan_ip(dut, vlan, ip_address, commands=None):
+    if commands is not None:
+        commands.extend(configure_vlan_ip_commands(vlan, ip_address))
+        return
+    commands = ["configure terminal", *configure_vlan_ip_commands(vlan, ip_address)]
+    st.config(dut, commands, type="klish")
+    _invalidate_vlan_cache(dut)
+
+
+def configure_interface_ip_commands(interface, ip_address, clear_ip=True):
+    """Config-mode commands that replace the IP address on a physical interface"""
+    return [
+        *(remove_ip_commands(interface) if clear_ip else []),
         f"interface {interface}",
         "no shutdown",
         f"ip address {ip_address}",
-        "exit",
         "exit"
     ]
+
+
+def configure_interface_ip(dut, interface, ip_address, commands=None):
+    """Configure IP address on physical interface (existing IP removed in the same batch)"""
+    if commands is not None:
+        commands.extend(configure_interface_ip_commands(interface, ip_address, _iface_has_ip(dut, interface)))
+        return
+    
+    st.log(f"[{dut}] Configuring IP {ip_address} on {interface}")
+    
+    commands = [
+        "configure terminal",
+        *configure_interface_ip_commands(interface, ip_address, _iface_has_ip(dut, interface))
+    ]
     
     st.config(dut, commands, type="klish")
+    _iface_ip_state[(dut, interface)] = ip_address
 
 
-def add_static_route(dut, destination, gateway):
+def add_static_route(dut, destination, gateway, commands=None):
     """Add static route"""
+    if commands is not None:
+        commands.append(f"ip route {destination} {gateway}")
+        return
+    
     st.log(f"[{dut}] Adding static route: {destination} via {gateway}")
     
     commands = [
         "configure terminal",
-        f"ip route {destination} {gateway}",
-        "exit"
+        f"ip route {destination} {gateway}"
     ]
     
     st.config(dut, commands, type="klish")
@@ -386,32 +633,90 @@ def add_static_route(dut, destination, gateway):
 
 def enable_ip_routing(dut):
     """Enable IP routing on device - SONiC has routing enabled by default"""
-    st.log(f"[{dut}] IP routing is enabled by default in SONiC")
+    debug_log("[%s] IP routing is enabled by default in SONiC", dut)
     # SONiC doesn't need explicit "ip routing" command
     # Routing is enabled when IP addresses are configured on interfaces
 
 
-# =============================================================================
-# TESTING UTILITIES
-# =============================================================================
-def ping_test(dut, src_ip, dst_ip, pkt_size=64, count=5, xml_logger=None):
+def wait_for_ip_up(dut, ip_address, timeout=15, interval=1):
     """
-    Execute ping test.
-    Simple ping command without -I option to avoid docker crash.
+    Poll "show ip interface" until the row carrying ip_address is up/up.
+    Returns (is_up, last output) so callers can reuse the final snapshot.
     """
-    cmd = f"ping {dst_ip} -s {pkt_size} -c {count}"
+    deadline = time.monotonic() + timeout
+    while True:
+        output = st.show(dut, "show ip interface", skip_tmpl=True)
+        if any(ip_address in line and "up/up" in line for line in output.splitlines()):
+            debug_log("[%s] %s is up", dut, ip_address)
+            return True, output
+        if time.monotonic() >= deadline:
+            st.log(f"[{dut}] {ip_address} not up/up after {timeout}s")
+            return False, output
+        time.sleep(interval)
+
+
+def setup_vlan_on_dut(dut, vlan, interface, ip_address):
+    """Create VLAN, add the access port and configure the SVI IP in one klish batch"""
+    st.log(f"[{dut}] Creating VLAN {vlan} with {interface} and IP {ip_address}")
     
-    st.log(f"[{dut}] Executing: {cmd}")
+    commands = []
+    create_vlan(dut, vlan, commands=commands)
+    add_interface_to_vlan(dut, interface, vlan, commands=commands)
+    configure_vlan_ip(dut, vlan, ip_address, commands=commands)
     
-    output = st.show(dut, cmd, skip_tmpl=True)
+    st.config(dut, ["configure terminal", *commands], type="klish")
+    _invalidate_vlan_cache(dut)
+    _iface_ip_state[(dut, interface)] = None
+
+
+def setup_transit_on_dut(dut, interface, ip_address, destination, gateway):
+    """Configure the transit IP and the static route across it in one klish batch"""
+    st.log(f"[{dut}] Configuring IP {ip_address} on {interface}, route {destination} via {gateway}")
+    
+    commands = []
+    configure_interface_ip(dut, interface, ip_address, commands=commands)
+    add_static_route(dut, destination, gateway, commands=commands)
+    
+    st.config(dut, ["configure terminal", *commands], type="klish")
+    _iface_ip_state[(dut, interface)] = ip_address
+
+
+def pretest_dut(dut, vlan, interfaces, xml_logger):
+    """Pre-test cleanup of one device, then seed the IP state of interfaces"""
+    cleanup_vlan(dut, vlan, xml_logger)
+    record_ip_interfaces(dut, show_and_save(dut, "show ip interface"), interfaces)
+
+
+def teardown_dut(dut, destination, gateway, transit_interface, vlan, xml_logger):
+    """Post-test cleanup of one device: static route, transit IP and VLAN"""
+    # Remove static route
+    st.log(f"[{dut}] Removing static route...")
+    commands = ["configure terminal", f"no ip route {destination} {gateway}"]
+    output = st.config(dut, commands, type="klish", skip_error_check=True)
+    if XML_ENABLED:
+        xml_logger.add_posttest_entry(dut, "Remove static route", _Lazy(" ".join, commands), _Lazy(str, output), "PASS")
+    
+    # Remove IP (skipped only when the interface is known to have none)
+    if _iface_has_ip(dut, transit_interface):
+        remove_ip_from_interface(dut, transit_interface)
+    
+    # Cleanup VLAN
+    cleanup_vlan(dut, vlan, xml_logger, stage="posttest")
+
+
+# =============================================================================
+# TESTING UTILITIES
+# =============================================================================
+def evaluate_ping(dut, src_ip, dst_ip, pkt_size, output, xml_logger=None):
+    """Save, parse and record one ping output; returns True on 0% loss"""
     save_command_output(dut, f"ping_{dst_ip}_size{pkt_size}", output)
     
     # Parse results
-    loss_match = re.search(r"(\d+)% packet loss", output)
+    loss_match = _LOSS_RE.search(output)
     loss = int(loss_match.group(1)) if loss_match else 100
     
-    rtt_match = re.search(r"rtt min/avg/max/mdev = ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+)", output)
-    rtt_avg = float(rtt_match.group(2)) if rtt_match else None
+    rtt_match = _RTT_RE.search(output)
+    rtt_avg = float(rtt_match.group(1)) if rtt_match else None
     
     ping_passed = (loss == 0)
     
@@ -445,20 +750,41 @@ def ping_test(dut, src_ip, dst_ip, pkt_size=64, count=5, xml_logger=None):
     return True
 
 
-def verify_connectivity(dut, src_ip, dst_ip, xml_logger=None):
-    """Test connectivity between two IPs with multiple packet sizes"""
-    st.log(f"Testing connectivity: {src_ip} -> {dst_ip}")
+def multi_ping(dut, targets, count=5, xml_logger=None):
+    """
+    Run every (src_ip, dst_ip, pkt_size) ping in targets concurrently from
+    one shell command on the DUT. Each ping writes to its own temp file
+    (launches staggered by 50ms to avoid bursting the DUT CPU); the files
+    are printed behind index markers and every block is evaluated with
+    evaluate_ping. No -I option is used, to avoid the docker crash.
+    Returns the pass/fail results in target order.
+    """
+    tmp = f"/tmp/{TEST_NAME}_ping"
+    launches = "".join(
+        f"ping {dst_ip} -s {pkt_size} -c {count} > {tmp}_{i}.log 2>&1 & sleep 0.05; "
+        for i, (_, dst_ip, pkt_size) in enumerate(targets)
+    )
+    indexes = " ".join(str(i) for i in range(len(targets)))
+    cmd = (
+        f"{launches}wait; "
+        f"for i in {indexes}; do echo \"{PING_MARK} $i\"; cat {tmp}_$i.log; done; "
+        f"rm -f {tmp}_*.log"
+    )
+    
+    st.log(f"[{dut}] Executing {len(targets)} pings concurrently")
+    if DEBUG:
+        debug_log("[%s] Ping targets: %s", dut,
+                  ", ".join(f"{dst_ip} (size={pkt_size})" for _, dst_ip, pkt_size in targets))
     
-    all_passed = True
-    for pkt_size in PKT_SIZES:
-        st.log(f"--- Packet size: {pkt_size} bytes ---")
-        result = ping_test(dut, src_ip, dst_ip, pkt_size, PING_COUNT, xml_logger)
-        if not result:
-            all_passed = False
-            st.error(f"Ping failed for packet size {pkt_size}")
-        time.sleep(1)
+    output = st.show(dut, cmd, skip_tmpl=True)
+    parts = re.split(rf"^{PING_MARK} (\d+)\s*$", output, flags=re.M)
+    blocks = dict(zip(parts[1::2], parts[2::2]))
     
-    return all_passed
+    # A target with no block counts as 100% loss
+    return [
+        evaluate_ping(dut, src_ip, dst_ip, pkt_size, blocks.get(str(i), ""), xml_logger)
+        for i, (src_ip, dst_ip, pkt_size) in enumerate(targets)
+    ]
 
 
 # =============================================================================
@@ -534,73 +860,61 @@ def test_inter_vlan_routing():
         st.banner("PHASE 2: PRE-TEST CLEANUP")
         log_to_file(log_file, "=== PHASE 2: PRE-TEST CLEANUP ===")
         
-        # Check and cleanup VLAN10 on DUT1
-        cleanup_vlan(dut1, VLAN10, xml_logger)
-        
-        # Check and cleanup VLAN20 on DUT2
-        cleanup_vlan(dut2, VLAN20, xml_logger)
+        # Check and cleanup VLAN10 on DUT1 and VLAN20 on DUT2, then read
+        # which test interfaces still carry an IP so setup can skip the
+        # "no ip address" step on the ones that don't
+        _iface_ip_state.clear()
+        [_, exceptions] = st.exec_all([
+            [pretest_dut, dut1, VLAN10, [DUT1_VLAN_INTERFACE, DUT1_TRANSIT_INTERFACE], xml_logger],
+            [pretest_dut, dut2, VLAN20, [DUT2_VLAN_INTERFACE, DUT2_TRANSIT_INTERFACE], xml_logger],
+        ])
+        ensure_no_exception(exceptions)
         
         # =====================================================================
-        # PHASE 3: CREATE VLAN10 ON DUT1
+        # PHASE 3/4: CREATE VLAN10 ON DUT1 AND VLAN20 ON DUT2 (in parallel)
         # =====================================================================
-        st.banner("PHASE 3: CREATE VLAN10 ON DUT1")
+        st.banner("PHASE 3/4: CREATE VLAN10 ON DUT1 AND VLAN20 ON DUT2")
         log_to_file(log_file, "=== PHASE 3: CREATE VLAN10 ON DUT1 ===")
-        
-        # Create VLAN10
-        create_vlan(dut1, VLAN10)
-        
-        # Add Ethernet0 to VLAN10
-        add_interface_to_vlan(dut1, DUT1_VLAN_INTERFACE, VLAN10)
-        
-        # Configure IP on VLAN10
-        configure_vlan_ip(dut1, VLAN10, DUT1_VLAN10_IP)
-        
-        # =====================================================================
-        # PHASE 4: CREATE VLAN20 ON DUT2
-        # =====================================================================
-        st.banner("PHASE 4: CREATE VLAN20 ON DUT2")
         log_to_file(log_file, "=== PHASE 4: CREATE VLAN20 ON DUT2 ===")
         
-        # Create VLAN20
-        create_vlan(dut2, VLAN20)
-        
-        # Add Ethernet0 to VLAN20
-        add_interface_to_vlan(dut2, DUT2_VLAN_INTERFACE, VLAN20)
-        
-        # Configure IP on VLAN20
-        configure_vlan_ip(dut2, VLAN20, DUT2_VLAN20_IP)
+        # Create VLAN, add Ethernet0 and configure the SVI IP on each DUT
+        [_, exceptions] = st.exec_all([
+            [setup_vlan_on_dut, dut1, VLAN10, DUT1_VLAN_INTERFACE, DUT1_VLAN10_IP],
+            [setup_vlan_on_dut, dut2, VLAN20, DUT2_VLAN_INTERFACE, DUT2_VLAN20_IP],
+        ])
+        ensure_no_exception(exceptions)
         
         # =====================================================================
-        # PHASE 5: CONFIGURE TRANSIT NETWORK
+        # PHASE 5/6: CONFIGURE TRANSIT NETWORK AND STATIC ROUTES
         # =====================================================================
-        st.banner("PHASE 5: CONFIGURE TRANSIT NETWORK")
+        # Transit IP and static route go out in a single klish batch per DUT.
+        st.banner("PHASE 5/6: CONFIGURE TRANSIT NETWORK AND STATIC ROUTES")
         log_to_file(log_file, "=== PHASE 5: CONFIGURE TRANSIT NETWORK ===")
+        log_to_file(log_file, "=== PHASE 6: ADD STATIC ROUTES ===")
         
-        # Configure Ethernet12 on DUT1
-        configure_interface_ip(dut1, DUT1_TRANSIT_INTERFACE, DUT1_TRANSIT_IP)
-        
-        # Configure Ethernet12 on DUT2
-        configure_interface_ip(dut2, DUT2_TRANSIT_INTERFACE, DUT2_TRANSIT_IP)
+        # DUT1: Ethernet12 + route to VLAN20 network via DUT2
+        # DUT2: Ethernet12 + route to VLAN10 network via DUT1
+        [_, exceptions] = st.exec_all([
+            [setup_transit_on_dut, dut1, DUT1_TRANSIT_INTERFACE, DUT1_TRANSIT_IP,
+             "192.168.20.0/24", "192.168.100.2"],
+            [setup_transit_on_dut, dut2, DUT2_TRANSIT_INTERFACE, DUT2_TRANSIT_IP,
+             "192.168.10.0/24", "192.168.100.1"],
+        ])
+        ensure_no_exception(exceptions)
         
         # Enable IP routing
         enable_ip_routing(dut1)
         enable_ip_routing(dut2)
         
-        # =====================================================================
-        # PHASE 6: ADD STATIC ROUTES
-        # =====================================================================
-        st.banner("PHASE 6: ADD STATIC ROUTES")
-        log_to_file(log_file, "=== PHASE 6: ADD STATIC ROUTES ===")
-        
-        # DUT1: Route to VLAN20 network via DUT2
-        add_static_route(dut1, "192.168.20.0/24", "192.168.100.2")
-        
-        # DUT2: Route to VLAN10 network via DUT1
-        add_static_route(dut2, "192.168.10.0/24", "192.168.100.1")
-        
-        # Wait for configuration
-        st.log("Waiting for configuration to stabilize...")
-        time.sleep(10)  # Increased wait time for interfaces to come up
+        # Wait for configuration: poll both transit interfaces instead of a
+        # fixed 10s sleep; proceed as soon as they are up (15s cap)
+        st.log("Waiting for transit interfaces to come up...")
+        [results, exceptions] = st.exec_all([
+            [wait_for_ip_up, dut1, DUT1_TRANSIT_IP],
+            [wait_for_ip_up, dut2, DUT2_TRANSIT_IP],
+        ])
+        ensure_no_exception(exceptions)
+        (dut1_up, dut1_ip_output), (dut2_up, dut2_ip_output) = results
         
         # =====================================================================
         # PHASE 7: VERIFY INTERFACES ARE UP
@@ -608,38 +922,46 @@ def test_inter_vlan_routing():
         st.banner("PHASE 7: VERIFY INTERFACES ARE UP")
         log_to_file(log_file, "=== PHASE 7: VERIFY INTERFACES ===")
         
-        # Check interface status
+        # Check interface status (last snapshot from the Phase 5/6 wait)
         st.log("Checking interface status...")
-        output = st.show(dut1, "show ip interface", skip_tmpl=True)
-        save_command_output(dut1, "show_ip_interface", output)
+        if not (dut1_up and dut2_up):
+            st.log("Transit interfaces not confirmed up, continuing to connectivity checks")
+        
+        save_command_output(dut1, "show_ip_interface", dut1_ip_output)
+        record_ip_interfaces(dut1, dut1_ip_output)
         
-        output = st.show(dut2, "show ip interface", skip_tmpl=True)
-        save_command_output(dut2, "show_ip_interface", output)
+        save_command_output(dut2, "show_ip_interface", dut2_ip_output)
+        record_ip_interfaces(dut2, dut2_ip_output)
         
         # =====================================================================
-        # PHASE 8: VERIFY TRANSIT CONNECTIVITY
+        # PHASE 8/9: TRANSIT AND INTER-VLAN CONNECTIVITY
         # =====================================================================
-        st.banner("PHASE 8: VERIFY TRANSIT CONNECTIVITY")
+        # The transit ping shares DUT1's batch with the forward pings and
+        # both DUTs ping at the same time; transit is still judged first.
+        st.banner("PHASE 8/9: TRANSIT AND INTER-VLAN CONNECTIVITY")
         log_to_file(log_file, "=== PHASE 8: VERIFY TRANSIT ===")
+        log_to_file(log_file, "=== PHASE 9: INTER-VLAN CONNECTIVITY ===")
         
         st.log("Testing transit link (192.168.100.1 <-> 192.168.100.2)")
-        transit_ok = ping_test(dut1, "192.168.100.1", "192.168.100.2", 64, PING_COUNT, xml_logger)
+        st.log("Testing Inter-VLAN: 192.168.10.1 -> 192.168.20.1")
+        st.log("Testing reverse Inter-VLAN: 192.168.20.1 -> 192.168.10.1")
+        dut1_targets = [("192.168.100.1", "192.168.100.2", 64)]
+        dut1_targets += [("192.168.10.1", "192.168.20.1", size) for size in PKT_SIZES]
+        dut2_targets = [("192.168.20.1", "192.168.10.1", size) for size in PKT_SIZES]
+        [results, exceptions] = st.exec_all([
+            [multi_ping, dut1, dut1_targets, PING_COUNT, xml_logger],
+            [multi_ping, dut2, dut2_targets, PING_COUNT, xml_logger],
+        ])
+        ensure_no_exception(exceptions)
+        dut1_results, dut2_results = results
         
+        transit_ok = dut1_results[0]
         if not transit_ok:
             st.error("Transit link connectivity failed")
             st.report_fail("ping_fail")
         
-        # =====================================================================
-        # PHASE 9: INTER-VLAN CONNECTIVITY TEST
-        # =====================================================================
-        st.banner("PHASE 9: INTER-VLAN CONNECTIVITY TEST")
-        log_to_file(log_file, "=== PHASE 9: INTER-VLAN CONNECTIVITY ===")
-        
-        st.log("Testing Inter-VLAN: 192.168.10.1 -> 192.168.20.1")
-        forward_ok = verify_connectivity(dut1, "192.168.10.1", "192.168.20.1", xml_logger)
-        
-        st.log("Testing reverse Inter-VLAN: 192.168.20.1 -> 192.168.10.1")
-        reverse_ok = verify_connectivity(dut2, "192.168.20.1", "192.168.10.1", xml_logger)
+        forward_ok = all(dut1_results[1:])
+        reverse_ok = all(dut2_results)
         
         # =====================================================================
         # PHASE 10: POST-TEST CLEANUP
@@ -647,40 +969,14 @@ def test_inter_vlan_routing():
         st.banner("PHASE 10: POST-TEST CLEANUP")
         log_to_file(log_file, "=== PHASE 10: POST-TEST CLEANUP ===")
         
-        # Remove static routes
-        st.log("Removing static routes...")
-        commands = ["configure terminal", "no ip route 192.168.20.0/24 192.168.100.2", "exit"]
-        output = st.config(dut1, commands, type="klish", skip_error_check=True)
-        xml_logger.add_posttest_entry(dut1, "Remove static route", " ".join(commands), str(output), "PASS")
-        
-        commands = ["configure terminal", "no ip route 192.168.10.0/24 192.168.100.1", "exit"]
-        output = st.config(dut2, commands, type="klish", skip_error_check=True)
-        xml_logger.add_posttest_entry(dut2, "Remove static route", " ".join(commands), str(output), "PASS")
-        
-        # Remove IPs
-        remove_ip_from_interface(dut1, DUT1_TRANSIT_INTERFACE)
-        remove_ip_from_interface(dut2, DUT2_TRANSIT_INTERFACE)
-        
-        # Cleanup VLANs
-        if check_vlan_exists(dut1, VLAN10):
-            members = get_vlan_members(dut1, VLAN10)
-            commands = ["configure terminal"]
-            commands.extend([f"interface Vlan{VLAN10}", "no ip address", "exit"])
-            for port in members:
-                commands.extend([f"interface {port}", "no switchport access vlan", "exit"])
-            commands.extend([f"no vlan {VLAN10}", "exit"])
-            output = st.config(dut1, commands, type="klish", skip_error_check=True)
-            xml_logger.add_posttest_entry(dut1, f"Cleanup VLAN {VLAN10}", " ".join(commands), str(output), "PASS")
-        
-        if check_vlan_exists(dut2, VLAN20):
-            members = get_vlan_members(dut2, VLAN20)
-            commands = ["configure terminal"]
-            commands.extend([f"interface Vlan{VLAN20}", "no ip address", "exit"])
-            for port in members:
-                commands.extend([f"interface {port}", "no switchport access vlan", "exit"])
-            commands.extend([f"no vlan {VLAN20}", "exit"])
-            output = st.config(dut2, commands, type="klish", skip_error_check=True)
-            xml_logger.add_posttest_entry(dut2, f"Cleanup VLAN {VLAN20}", " ".join(commands), str(output), "PASS")
+        # Remove static routes, transit IPs and VLANs on both DUTs
+        [_, exceptions] = st.exec_all([
+            [teardown_dut, dut1, "192.168.20.0/24", "192.168.100.2",
+             DUT1_TRANSIT_INTERFACE, VLAN10, xml_logger],
+            [teardown_dut, dut2, "192.168.10.0/24", "192.168.100.1",
+             DUT2_TRANSIT_INTERFACE, VLAN20, xml_logger],
+        ])
+        ensure_no_exception(exceptions)
         
         # =====================================================================
         # SAVE XML LOGS
@@ -10,12 +10,18 @@ from __future__ import annotations
 import yaml
 import pytest
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 import paramiko
 from spytest import st
 from spytest import SpyTestDict
 import apis.system.basic as basic_api
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 # YAML file path
 YAML_PATH = "/home/adminuser/Shiva/sonic-mgmt/spytest/testbeds/vs_sonic.yaml"
 
@@ -23,13 +29,14 @@ YAML_PATH = "/home/adminuser/Shiva/sonic-mgmt/spytest/testbeds/vs_sonic.yaml"
 LOG_DIR = "/home/adminuser/Shiva/sonic-mgmt/spytest/tests/logs"
 
 
+@lru_cache(maxsize=1)
 def load_testbed_yaml() -> SpyTestDict:
-    """Load DUT details from YAML testbed file."""
+    """Load DUT details from YAML testbed file (parsed once per process)."""
     if not Path(YAML_PATH).is_file():
         raise FileNotFoundError(f"Testbed YAML not found: {YAML_PATH}")
 
     with open(YAML_PATH, "r") as f:
-        data = yaml.safe_load(f)
+        data = yaml.load(f, Loader=SafeLoader)
 
     return SpyTestDict(data)
 
@@ -54,6 +61,39 @@ def testbed_data():
     return data
 
 
+@pytest.fixture(scope="module")
+def ssh_client(testbed_data):
+    """Paramiko connection to D1, opened once and shared by the module's tests."""
+    dut = testbed_data.devices["D1"]
+
+    ip = dut.connection_params.ip
+    username = dut.connection_params.username
+    password = dut.connection_params.password
+
+    st.log(f"Attempting SSH connection to DUT {ip} using Paramiko...")
+
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        client.connect(
+            ip,
+            username=username,
+            password=password,
+            timeout=10,
+            allow_agent=False,
+            look_for_keys=False
+        )
+        # Keep the shared session alive between tests
+        client.get_transport().set_keepalive(30)
+    except Exception as e:
+        client.close()
+        st.error(f"SSH FAILED: {e}")
+        st.report_fail("msg", f"SSH connection to {ip} failed: {e}")
+
+    yield client
+    client.close()
+
+
 def test_load_yaml(testbed_data):
     """Test 1: Validate YAML loading and print DUT details."""
     log_file = create_log_file("test_load_yaml")
@@ -76,33 +116,15 @@ def test_load_yaml(testbed_data):
 
 
 
-def test_ssh_connection(testbed_data):
+def test_ssh_connection(testbed_data, ssh_client):
     """Test 2: Validate SSH access to DUT using Paramiko inside SpyTest."""
     log_file = create_log_file("test_ssh_connection")
 
-    dut = testbed_data.devices["D1"]
-
-    ip = dut.connection_params.ip
-    username = dut.connection_params.username
-    password = dut.connection_params.password
+    ip = testbed_data.devices["D1"].connection_params.ip
 
-    st.log(f"Attempting SSH connection to DUT {ip} using Paramiko...")
+    transport = ssh_client.get_transport()
+    if transport is None or not transport.is_active():
+        st.report_fail("msg", f"SSH connection to {ip} is not active")
 
-    try:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        client.connect(
-            ip,
-            username=username,
-            password=password,
-            timeout=10,
-            allow_agent=False,
-            look_for_keys=False
-        )
-        st.log("SSH connection established successfully.")
-        client.close()
-        st.report_pass("test_case_passed")
-
-    except Exception as e:
-        st.error(f"SSH FAILED: {e}")
-        st.report_fail("msg", f"SSH connection to {ip} failed: {e}")
+    st.log("SSH connection established successfully.")
+    st.report_pass("test_case_passed")